@@ -1,4 +1,5 @@
-import pandas as pd
+import argparse
+
 import numpy as np
 import joblib
 
@@ -6,11 +7,20 @@ from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, accuracy_score
 
+from backend.app.table_io import read_table
+
 
-def advanced():
+def advanced(
+    input_path="feature_data.parquet",
+    model_path="final_model.pkl",
+    n_estimators=100,
+    max_depth=5,  # the chosen final depth; pipeline.py and --tune override it
+    min_samples_leaf=15,
+    cv_folds=5,
+):
 
     print("Loading feature dataset...")
-    df = pd.read_csv("feature_data.csv")
+    df = read_table(input_path)
 
     X = df.drop("Delivery_Status", axis=1)
     y = df["Delivery_Status"]
@@ -23,15 +33,15 @@ def advanced():
     )
 
     model = RandomForestClassifier(
-        n_estimators=100,
-        max_depth=5,        # ✅ FINAL DEPTH
-        min_samples_leaf=15,
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        min_samples_leaf=min_samples_leaf,
         random_state=42,
         n_jobs=-1
     )
 
-    print("\nRunning 5-Fold Cross Validation...")
-    cv_scores = cross_val_score(model, X_train, y_train, cv=5)
+    print(f"\nRunning {cv_folds}-Fold Cross Validation...")
+    cv_scores = cross_val_score(model, X_train, y_train, cv=cv_folds)
     print("Average CV Accuracy:", np.mean(cv_scores))
 
     print("\nTraining Final Model...")
@@ -45,9 +55,22 @@ def advanced():
     print("\nClassification Report:")
     print(classification_report(y_test, preds))
 
-    joblib.dump(model, "final_model.pkl")
-    print("\nModel saved as final_model.pkl")
+    joblib.dump(model, model_path)
+    print("\nModel saved as", model_path)
 
 
 if __name__ == "__main__":
-    advanced()
\ No newline at end of file
+    # Imported only when run as a script, so pipeline.py's code hash for the
+    # training stage does not include the tuner.
+    from model_tuning import add_tuning_arguments, tune_from_args
+
+    parser = argparse.ArgumentParser(description="Train the final RandomForest, or search its settings with --tune.")
+    parser.add_argument("--tune", action="store_true", help="run the successive-halving search instead of training")
+    parser.add_argument("--input", default="feature_data.parquet")
+    add_tuning_arguments(parser)
+    args = parser.parse_args()
+
+    if args.tune:
+        tune_from_args(args, args.input)
+    else:
+        advanced(input_path=args.input)
\ No newline at end of file
@@ -0,0 +1,472 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+
+import pandas as pd
+
+from .batch_scoring import (
+    BATCH_REQUIRED_COLUMNS,
+    CSV_RESULT_COLUMNS,
+    missing_batch_columns,
+    output_rows,
+    rows_to_csv,
+    score_batch_frame,
+)
+from .config import (
+    BATCH_CHUNK_ROWS,
+    BATCH_JOBS_MAX_ACTIVE,
+    BATCH_JOBS_MAX_RUNNING,
+    BATCH_JOBS_WORKERS,
+    JOBS_DB_PATH,
+    JOBS_DIR,
+)
+from .model_registry import get_model_registry
+
+
+ACTIVE_STATUSES = ("queued", "running")
+
+JOB_COLUMNS = [
+    "id",
+    "username",
+    "status",
+    "filename",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "total_rows",
+    "processed_rows",
+    "error",
+]
+
+
+class JobLimitError(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _get_conn() -> sqlite3.Connection:
+    Path(JOBS_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _job_dir(job_id: str) -> Path:
+    return Path(JOBS_DIR) / job_id
+
+
+def _input_path(job_id: str) -> Path:
+    return _job_dir(job_id) / "input.csv"
+
+
+def result_path(job_id: str) -> Path:
+    return _job_dir(job_id) / "result.csv"
+
+
+def init_jobs_db() -> None:
+    conn = _get_conn()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS batch_jobs (
+            id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            status TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            total_rows INTEGER,
+            processed_rows INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            runner_token TEXT,
+            heartbeat_at TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(batch_jobs)")}
+    for column, definition in (
+        ("runner_token", "TEXT"),
+        ("heartbeat_at", "TEXT"),
+        ("attempts", "INTEGER NOT NULL DEFAULT 0"),
+    ):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE batch_jobs ADD COLUMN {column} {definition}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_batch_jobs_status ON batch_jobs (status, created_at)")
+    conn.commit()
+    conn.close()
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    return {column: row[column] for column in JOB_COLUMNS}
+
+
+def create_job(username: str, filename: str, upload) -> dict:
+    conn = _get_conn()
+    try:
+        active = conn.execute(
+            "SELECT COUNT(*) FROM batch_jobs WHERE status IN (?, ?)", ACTIVE_STATUSES
+        ).fetchone()[0]
+    finally:
+        conn.close()
+    if active >= BATCH_JOBS_MAX_ACTIVE:
+        raise JobLimitError(f"Too many active jobs (limit {BATCH_JOBS_MAX_ACTIVE})")
+
+    job_id = uuid.uuid4().hex
+    input_path = _input_path(job_id)
+    input_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(input_path, "wb") as f:
+        shutil.copyfileobj(upload, f)
+
+    try:
+        missing = missing_batch_columns(pd.read_csv(input_path, nrows=0).columns)
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+        # Counted with the same parser the job reads with (one column), so
+        # quoted newlines and a missing final newline cannot push
+        # processed_rows past total_rows.
+        total_rows = sum(
+            len(chunk)
+            for chunk in pd.read_csv(input_path, usecols=BATCH_REQUIRED_COLUMNS[:1], chunksize=BATCH_CHUNK_ROWS)
+        )
+    except ValueError:
+        shutil.rmtree(input_path.parent, ignore_errors=True)
+        raise
+
+    conn = _get_conn()
+    conn.execute(
+        """
+        INSERT INTO batch_jobs (id, username, status, filename, created_at, total_rows)
+        VALUES (?, ?, 'queued', ?, ?, ?)
+        """,
+        (job_id, username, filename, _now(), total_rows),
+    )
+    conn.commit()
+    conn.close()
+    return get_job(job_id, username)
+
+
+def get_job(job_id: str, username: str) -> dict | None:
+    conn = _get_conn()
+    row = conn.execute(
+        f"SELECT {', '.join(JOB_COLUMNS)} FROM batch_jobs WHERE id = ? AND username = ?",
+        (job_id, username),
+    ).fetchone()
+    conn.close()
+    return _row_to_job(row) if row else None
+
+
+def list_jobs(username: str, limit: int = 50) -> list[dict]:
+    conn = _get_conn()
+    rows = conn.execute(
+        f"""
+        SELECT {', '.join(JOB_COLUMNS)}
+        FROM batch_jobs
+        WHERE username = ?
+        ORDER BY created_at DESC
+        LIMIT ?
+        """,
+        (username, limit),
+    ).fetchall()
+    conn.close()
+    return [_row_to_job(row) for row in rows]
+
+
+def request_cancel(job_id: str, username: str) -> dict | None:
+    conn = _get_conn()
+    conn.execute(
+        "UPDATE batch_jobs SET cancel_requested = 1 WHERE id = ? AND username = ? AND status IN (?, ?)",
+        (job_id, username, *ACTIVE_STATUSES),
+    )
+    conn.execute(
+        """
+        UPDATE batch_jobs SET status = 'cancelled', finished_at = ?
+        WHERE id = ? AND username = ? AND status = 'queued'
+        """,
+        (_now(), job_id, username),
+    )
+    conn.commit()
+    conn.close()
+    return get_job(job_id, username)
+
+
+def _init_worker() -> None:
+    get_model_registry().current()
+
+
+def _score_chunk(chunk: pd.DataFrame, model_version: str) -> tuple[int, str]:
+    # Pool workers have no watcher thread; the parent resolves the version
+    # once per job and a worker only reloads when it is behind.
+    registry = get_model_registry()
+    if registry.current().version != model_version:
+        registry.reload()
+    validated_rows, results = score_batch_frame(chunk)
+    return len(validated_rows), rows_to_csv(output_rows(validated_rows, results), header=False)
+
+
+class BatchJobRunner:
+    # Each server process runs its own dispatcher and pool. Running jobs are
+    # heartbeated by their runner's token; one whose heartbeat goes stale
+    # (the process died or the container restarted, even if a PID was
+    # reused) is requeued by whichever runner notices, up to MAX_ATTEMPTS.
+    POLL_INTERVAL_SECONDS = 1.0
+    STALE_AFTER_SECONDS = 30.0
+    MAX_ATTEMPTS = 3
+
+    def __init__(self, max_workers: int, max_running: int, chunk_rows: int):
+        # max_workers sizes this process's pool; max_running is enforced
+        # across every process sharing jobs.db.
+        self.max_workers = max(1, max_workers)
+        self.max_running = max(1, max_running)
+        self.chunk_rows = chunk_rows
+        self.token = uuid.uuid4().hex
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._dispatcher: threading.Thread | None = None
+        self._running: dict[str, threading.Thread] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._dispatcher is not None and self._dispatcher.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping.clear()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="batch-job-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._dispatcher.join()
+        self._dispatcher = None
+        for thread in list(self._running.values()):
+            thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn, not fork: the server process is multi-threaded.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._pool
+
+    def _reset_pool(self, broken: ProcessPoolExecutor) -> None:
+        # A worker died (e.g. OOM on a large chunk): the executor is unusable
+        # from then on, so drop it and let the next job build a fresh one.
+        with self._pool_lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _requeue(self, conn: sqlite3.Connection, reason: str, where: str, **params) -> int:
+        # Back on the queue, or failed once the job has used up its attempts.
+        exhausted = "attempts >= :max_attempts"
+        return conn.execute(
+            f"""
+            UPDATE batch_jobs SET
+                status = CASE WHEN {exhausted} THEN 'failed' ELSE 'queued' END,
+                finished_at = CASE WHEN {exhausted} THEN :now END,
+                started_at = CASE WHEN {exhausted} THEN started_at END,
+                error = :reason,
+                processed_rows = 0,
+                runner_token = NULL,
+                heartbeat_at = NULL
+            WHERE status = 'running' AND {where}
+            """,
+            {"max_attempts": self.MAX_ATTEMPTS, "now": _now(), "reason": reason, **params},
+        ).rowcount
+
+    def _heartbeat(self) -> None:
+        stale_before = (datetime.utcnow() - timedelta(seconds=self.STALE_AFTER_SECONDS)).isoformat()
+        conn = _get_conn()
+        try:
+            conn.execute(
+                "UPDATE batch_jobs SET heartbeat_at = ? WHERE status = 'running' AND runner_token = ?",
+                (_now(), self.token),
+            )
+            requeued = self._requeue(
+                conn,
+                "runner stopped responding",
+                "runner_token IS NOT :token AND (heartbeat_at IS NULL OR heartbeat_at < :stale_before)",
+                token=self.token,
+                stale_before=stale_before,
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        if requeued:
+            self._wake.set()
+
+    def _claim_next(self) -> str | None:
+        conn = _get_conn()
+        try:
+            # IMMEDIATE takes the write lock up front, so two processes cannot
+            # both see a free slot and claim past max_running.
+            conn.execute("BEGIN IMMEDIATE")
+            running = conn.execute("SELECT COUNT(*) FROM batch_jobs WHERE status = 'running'").fetchone()[0]
+            row = conn.execute(
+                "SELECT id FROM batch_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if running >= self.max_running or row is None:
+                conn.rollback()
+                return None
+            now = _now()
+            conn.execute(
+                """
+                UPDATE batch_jobs
+                SET status = 'running', started_at = ?, runner_token = ?, heartbeat_at = ?, attempts = attempts + 1
+                WHERE id = ? AND status = 'queued'
+                """,
+                (now, self.token, now, row["id"]),
+            )
+            conn.commit()
+            return row["id"]
+        finally:
+            conn.close()
+
+    def _dispatch(self) -> None:
+        while not self._stopping.is_set():
+            for job_id, thread in list(self._running.items()):
+                if not thread.is_alive():
+                    del self._running[job_id]
+            try:
+                self._heartbeat()
+                while len(self._running) < self.max_running:
+                    job_id = self._claim_next()
+                    if job_id is None:
+                        break
+                    thread = threading.Thread(target=self._run_job, args=(job_id,), name=f"batch-job-{job_id}", daemon=True)
+                    self._running[job_id] = thread
+                    thread.start()
+            except sqlite3.OperationalError:
+                # jobs.db busy with another process; try again next poll.
+                pass
+            self._wake.wait(self.POLL_INTERVAL_SECONDS)
+            self._wake.clear()
+
+    def _update(self, job_id: str, **fields) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        conn = _get_conn()
+        conn.execute(f"UPDATE batch_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        conn.commit()
+        conn.close()
+
+    def _attempts(self, job_id: str) -> int:
+        conn = _get_conn()
+        row = conn.execute("SELECT attempts FROM batch_jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        return int(row["attempts"]) if row else 0
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        conn = _get_conn()
+        row = conn.execute("SELECT cancel_requested FROM batch_jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        return bool(row and row["cancel_requested"])
+
+    def _run_job(self, job_id: str) -> None:
+        pool = self._get_pool()
+        model_version = get_model_registry().current().version
+        part_path = result_path(job_id).with_suffix(".part")
+        in_flight: deque = deque()
+        processed = 0
+
+        try:
+            with open(part_path, "w", encoding="utf-8", newline="") as out:
+                out.write(pd.DataFrame(columns=CSV_RESULT_COLUMNS).to_csv(index=False))
+
+                def drain_one() -> None:
+                    nonlocal processed
+                    rows, text = in_flight.popleft().result()
+                    out.write(text)
+                    processed += rows
+                    self._update(job_id, processed_rows=processed)
+
+                for chunk in pd.read_csv(_input_path(job_id), chunksize=self.chunk_rows):
+                    if self._stopping.is_set() or self._cancel_requested(job_id):
+                        raise JobCancelled()
+                    in_flight.append(pool.submit(_score_chunk, chunk, model_version))
+                    # Keep every worker busy without reading the whole file ahead.
+                    while len(in_flight) >= self.max_workers * 2:
+                        drain_one()
+                while in_flight:
+                    drain_one()
+        except JobCancelled:
+            for future in in_flight:
+                future.cancel()
+            part_path.unlink(missing_ok=True)
+            if not self._cancel_requested(job_id):
+                # Shutdown, not a user cancel: leave it for the next start
+                # without spending one of its attempts.
+                self._update(
+                    job_id,
+                    status="queued",
+                    started_at=None,
+                    processed_rows=0,
+                    runner_token=None,
+                    heartbeat_at=None,
+                    attempts=max(self._attempts(job_id) - 1, 0),
+                )
+            else:
+                self._update(job_id, status="cancelled", finished_at=_now())
+        except BrokenProcessPool:
+            for future in in_flight:
+                future.cancel()
+            part_path.unlink(missing_ok=True)
+            self._reset_pool(pool)
+            conn = _get_conn()
+            try:
+                self._requeue(conn, "a scoring process died", "id = :job_id", job_id=job_id)
+                conn.commit()
+            finally:
+                conn.close()
+            self._wake.set()
+        except Exception as exc:
+            for future in in_flight:
+                future.cancel()
+            part_path.unlink(missing_ok=True)
+            self._update(job_id, status="failed", finished_at=_now(), error=str(exc))
+        else:
+            os.replace(part_path, result_path(job_id))
+            self._update(job_id, status="completed", finished_at=_now(), processed_rows=processed, error=None)
+
+
+@lru_cache
+def get_job_runner() -> BatchJobRunner:
+    return BatchJobRunner(
+        max_workers=BATCH_JOBS_WORKERS,
+        max_running=BATCH_JOBS_MAX_RUNNING,
+        chunk_rows=BATCH_CHUNK_ROWS,
+    )
@@ -0,0 +1,129 @@
+import json
+import operator
+from io import StringIO
+from typing import get_args
+
+import pandas as pd
+
+from .config import CLASS_MAP
+from .predictor import predict_many
+from .schemas import PredictRequest
+
+
+BATCH_REQUIRED_COLUMNS = [
+    "delivery_partner",
+    "package_type",
+    "vehicle_type",
+    "delivery_mode",
+    "region",
+    "weather_condition",
+    "distance_km",
+    "package_weight_kg",
+    "delivery_rating",
+    "delivery_cost",
+]
+
+CATEGORICAL_BATCH_COLUMNS = BATCH_REQUIRED_COLUMNS[:6]
+NUMERIC_BATCH_COLUMNS = BATCH_REQUIRED_COLUMNS[6:]
+
+CSV_RESULT_COLUMNS = BATCH_REQUIRED_COLUMNS + [
+    "predicted_class_id",
+    "predicted_label",
+    "confidence",
+] + [f"probability_{label}" for label in CLASS_MAP.values()] + ["model_version"]
+
+
+def missing_batch_columns(columns) -> list[str]:
+    return [col for col in BATCH_REQUIRED_COLUMNS if col not in columns]
+
+
+def validate_batch_frame(df: pd.DataFrame) -> list[dict]:
+    normalized = pd.DataFrame(
+        {
+            **{
+                col: df[col].astype(str).str.lower().str.strip()
+                for col in CATEGORICAL_BATCH_COLUMNS
+            },
+            **{col: df[col].astype(float) for col in NUMERIC_BATCH_COLUMNS},
+        }
+    )
+    return [
+        PredictRequest(**raw).model_dump() for raw in normalized.to_dict(orient="records")
+    ]
+
+
+def _within_bounds(values: pd.Series, constraints) -> pd.Series:
+    ok = values.notna()
+    for constraint in constraints:
+        for name, compare in (("gt", operator.gt), ("ge", operator.ge), ("lt", operator.lt), ("le", operator.le)):
+            bound = getattr(constraint, name, None)
+            if bound is not None:
+                ok &= compare(values, bound)
+    return ok
+
+
+def first_invalid_row(df: pd.DataFrame) -> tuple[int, str] | None:
+    # Column-wise version of the checks PredictRequest applies per row, so a
+    # whole upload can be vetted before any of it is scored. Returns the
+    # 0-based position of the first rejected row and the offending column.
+    invalid = []
+    for col in CATEGORICAL_BATCH_COLUMNS:
+        allowed = set(get_args(PredictRequest.model_fields[col].annotation))
+        invalid.append((col, ~df[col].astype(str).str.lower().str.strip().isin(allowed).to_numpy()))
+    for col in NUMERIC_BATCH_COLUMNS:
+        values = pd.to_numeric(df[col], errors="coerce")
+        invalid.append((col, ~_within_bounds(values, PredictRequest.model_fields[col].metadata).to_numpy()))
+
+    first = None
+    for col, mask in invalid:
+        if mask.any():
+            position = int(mask.argmax())
+            if first is None or position < first[0]:
+                first = (position, col)
+    return first
+
+
+def score_batch_frame(df: pd.DataFrame) -> tuple[list[dict], list[dict]]:
+    validated_rows = validate_batch_frame(df)
+    results = predict_many(pd.DataFrame(validated_rows, columns=BATCH_REQUIRED_COLUMNS))
+    return validated_rows, results
+
+
+def history_entries(validated_rows: list[dict], results: list[dict]) -> list[dict]:
+    return [
+        {
+            "request_payload": validated,
+            "prediction_label": result["predicted_label"],
+            "prediction_id": result["predicted_class_id"],
+            "confidence": result["confidence"],
+            "model_version": result["model_version"],
+        }
+        for validated, result in zip(validated_rows, results)
+    ]
+
+
+def output_rows(validated_rows: list[dict], results: list[dict]) -> list[dict]:
+    return [
+        {
+            **validated,
+            **result,
+        }
+        for validated, result in zip(validated_rows, results)
+    ]
+
+
+def rows_to_ndjson(rows: list[dict]) -> str:
+    return "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def rows_to_csv(rows: list[dict], header: bool) -> str:
+    flat_rows = [
+        {
+            **{key: value for key, value in row.items() if key != "probabilities"},
+            **{f"probability_{label}": value for label, value in row["probabilities"].items()},
+        }
+        for row in rows
+    ]
+    buffer = StringIO()
+    pd.DataFrame(flat_rows, columns=CSV_RESULT_COLUMNS).to_csv(buffer, index=False, header=header)
+    return buffer.getvalue()
@@ -0,0 +1,317 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+from . import dashboard_aggregates, database, evaluation_cache
+from .config import BENCHMARK_BASELINE_PATH, BENCHMARK_RESULTS_PATH, CLASS_MAP, FEATURE_DATA_PATH
+from .insights_service import get_analytics_data, get_dashboard_overview, process_uploaded_dataset
+from .predictor import _predict_uncached, current_model, predict, predict_many, predict_rows
+from .preprocessing import CATEGORICAL_FIELDS
+from .table_io import resolve_table
+
+
+DEFAULT_THRESHOLD = 0.20
+MIN_ROUND_SECONDS = 0.05
+HISTORY_ROWS = 100_000
+
+
+class Case:
+    # func is called `number` times per round; rows is how many records one
+    # call handles, used for the rows/s column.
+    def __init__(self, name: str, func, rows: int = 1, skip_reason: str | None = None):
+        self.name = name
+        self.func = func
+        self.rows = rows
+        self.skip_reason = skip_reason
+
+
+def _payloads(count: int, seed: int = 42) -> list[dict]:
+    encoder = current_model().encoder
+    rng = np.random.default_rng(seed)
+    payloads = []
+    for _ in range(count):
+        payload = {
+            # Index 0 is the dropped baseline level; keep it reachable.
+            field: str(rng.choice(["__baseline__"] + encoder.categories[field]))
+            for field in CATEGORICAL_FIELDS
+        }
+        payload.update(
+            {
+                "distance_km": float(rng.uniform(1, 500)),
+                "package_weight_kg": float(rng.uniform(0.5, 50)),
+                "delivery_rating": float(rng.integers(1, 6)),
+                "delivery_cost": float(rng.uniform(50, 2500)),
+            }
+        )
+        payloads.append(payload)
+    return payloads
+
+
+def _upload_csv(rows: int, seed: int = 42) -> str:
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(
+        {
+            "order_volume": rng.integers(1, 400, rows),
+            "warehouse_time": rng.uniform(1, 48, rows).round(1),
+            "shipment_distance": rng.uniform(1, 800, rows).round(1),
+            "traffic_level": rng.choice(["low", "medium", "high"], rows),
+            "weather_indicator": rng.choice(["clear", "rain", "storm", "fog"], rows),
+            "historical_performance": rng.uniform(0.3, 1.0, rows).round(2),
+        }
+    )
+    return frame.to_csv(index=False)
+
+
+def _seed_history(rows: int, payloads: list[dict], seed: int = 42) -> None:
+    # Spread over the last 30 days so rollup and date-filter queries see a
+    # realistic number of buckets.
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    labels = list(CLASS_MAP.items())
+    conn = database._get_conn()
+    try:
+        for start in range(0, rows, 10_000):
+            batch = []
+            for offset in range(start, min(rows, start + 10_000)):
+                class_id, label = labels[int(rng.integers(len(labels)))]
+                batch.append(
+                    (
+                        f"user{offset % 20}",
+                        (now - timedelta(seconds=int(rng.integers(30 * 86400)))).isoformat(),
+                        json.dumps(payloads[offset % len(payloads)]),
+                        label,
+                        class_id,
+                        float(rng.uniform(0.34, 1.0)),
+                        "benchmark",
+                    )
+                )
+            database._write_rows(conn, batch)
+    finally:
+        conn.close()
+
+
+def isolate_state(tmp_dir: Path) -> None:
+    # Point every file the benchmarked code writes at a scratch directory so
+    # runs are repeatable and never touch the real history or artifacts.
+    database.HISTORY_DB_PATH = tmp_dir / "history.db"
+    dashboard_aggregates.DASHBOARD_AGGREGATES_PATH = tmp_dir / "dashboard_aggregates.json"
+    evaluation_cache.EVALUATION_CACHE_PATH = tmp_dir / "evaluation_cache.json"
+    database.init_db()
+
+
+def build_cases(history_rows: int = HISTORY_ROWS) -> list[Case]:
+    handle = current_model()
+    encoder = handle.encoder
+    payloads = _payloads(10_000)
+    frames = {size: pd.DataFrame(payloads[:size]) for size in (1, 100, 1_000, 10_000)}
+    uploads = {size: _upload_csv(size) for size in (1_000, 10_000)}
+    row_buffer = np.zeros(encoder.n_features, dtype=np.float32)
+
+    _seed_history(history_rows, payloads)
+    middle_id = history_rows // 2
+    cursor = iter(range(sys.maxsize))
+
+    def next_payload() -> dict:
+        return payloads[next(cursor) % len(payloads)]
+
+    no_features = None if resolve_table(FEATURE_DATA_PATH).exists() else "feature_data not built (run pipeline.py)"
+    return [
+        Case("encoder.transform_row", lambda: encoder.transform_row(payloads[0], row_buffer)),
+        Case("encoder.transform[1000]", lambda: encoder.transform(frames[1_000], np.float32), rows=1000),
+        Case("predictor.predict[cached]", lambda: predict(payloads[0])),
+        Case("predictor.predict[uncached]", lambda: _predict_uncached(next_payload(), handle)),
+        Case("predictor.predict_rows[1]", lambda: predict_rows(payloads[:1])),
+        Case("predictor.predict_rows[100]", lambda: predict_rows(payloads[:100]), rows=100),
+        Case("predictor.predict_many[1]", lambda: predict_many(frames[1]), rows=1),
+        Case("predictor.predict_many[100]", lambda: predict_many(frames[100]), rows=100),
+        Case("predictor.predict_many[10000]", lambda: predict_many(frames[10_000]), rows=10_000),
+        Case("insights.process_uploaded_dataset[1000]", lambda: process_uploaded_dataset(uploads[1_000]), rows=1_000),
+        Case("insights.process_uploaded_dataset[10000]", lambda: process_uploaded_dataset(uploads[10_000]), rows=10_000),
+        Case(
+            "database.insert_history[sync]",
+            lambda: database.insert_history("bench", next_payload(), "On-Time", 0, 0.9, "benchmark"),
+        ),
+        Case("database.fetch_history[latest100]", lambda: database.fetch_history(limit=100), rows=100),
+        Case(
+            "database.fetch_history[label,no_payload]",
+            lambda: database.fetch_history(limit=100, prediction_label="Delayed", include_payload=False),
+            rows=100,
+        ),
+        Case(
+            "database.fetch_history[keyset_mid]",
+            lambda: database.fetch_history(limit=100, before_id=middle_id),
+            rows=100,
+        ),
+        Case("insights.get_dashboard_overview", get_dashboard_overview, skip_reason=no_features),
+        Case("insights.get_analytics_data", get_analytics_data, skip_reason=no_features),
+    ]
+
+
+def measure(func, repeats: int, min_round_seconds: float = MIN_ROUND_SECONDS) -> dict:
+    func()  # warm-up: lazy imports, first-call caches, page-ins
+
+    # Calls per round grow until one round takes min_round_seconds, as in
+    # timeit's autorange, so fast paths are not dominated by timer noise.
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - started >= min_round_seconds or number >= 100_000:
+            break
+        number *= 2
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 6),
+        "min_ms": round(min(samples) * 1000, 6),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 6),
+        "stdev_ms": round(statistics.stdev(samples) * 1000, 6) if len(samples) > 1 else 0.0,
+        "number": number,
+        "repeats": repeats,
+    }
+
+
+def environment() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_benchmarks(cases: list[Case], repeats: int, name_filter: str | None = None) -> dict:
+    results = {}
+    for case in cases:
+        if name_filter and name_filter not in case.name:
+            continue
+        if case.skip_reason:
+            print(f"{case.name:<42} skipped: {case.skip_reason}")
+            continue
+        result = measure(case.func, repeats)
+        result["rows"] = case.rows
+        result["rows_per_second"] = round(case.rows / (result["median_ms"] / 1000), 1) if result["median_ms"] else None
+        results[case.name] = result
+        print(f"{case.name:<42} {result['median_ms']:>11.4f} ms  (min {result['min_ms']:.4f}, n={result['number']}x{repeats})")
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "environment": environment(),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[dict]:
+    # Compares medians; a case regresses when it is more than `threshold`
+    # (0.2 = 20%) slower than the baseline.
+    rows = []
+    for name, result in current["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            rows.append({"name": name, "status": "new", "baseline_ms": None, "current_ms": result["median_ms"], "change": None})
+            continue
+        change = result["median_ms"] / previous["median_ms"] - 1 if previous["median_ms"] else 0.0
+        if change > threshold:
+            status = "REGRESSED"
+        elif change < -threshold:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append(
+            {
+                "name": name,
+                "status": status,
+                "baseline_ms": previous["median_ms"],
+                "current_ms": result["median_ms"],
+                "change": round(change, 4),
+            }
+        )
+    return rows
+
+
+def print_comparison(rows: list[dict], current: dict, baseline: dict, threshold: float) -> None:
+    if baseline.get("environment") != current["environment"]:
+        print("\nWarning: baseline was recorded in a different environment; timings may not be comparable.")
+    print(f"\n{'case':<42} {'baseline ms':>12} {'current ms':>12} {'change':>9}  status (threshold {threshold:.0%})")
+    for row in rows:
+        baseline_ms = f"{row['baseline_ms']:.4f}" if row["baseline_ms"] is not None else "-"
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        print(f"{row['name']:<42} {baseline_ms:>12} {row['current_ms']:>12.4f} {change:>9}  {row['status']}")
+
+
+def _write_json(data: dict, path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for the backend hot paths.")
+    parser.add_argument("--filter", default=None, help="only run cases whose name contains this text")
+    parser.add_argument("--repeats", type=int, default=7, help="timed rounds per case")
+    parser.add_argument("--history-rows", type=int, default=HISTORY_ROWS, help="rows seeded into the scratch history DB")
+    parser.add_argument("--output", default=str(BENCHMARK_RESULTS_PATH))
+    parser.add_argument("--baseline", default=str(BENCHMARK_BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="benchmarks-") as tmp_dir:
+        isolate_state(Path(tmp_dir))
+        print(f"Seeding {args.history_rows} history rows...")
+        cases = build_cases(args.history_rows)
+        print()
+        current = run_benchmarks(cases, args.repeats, args.filter)
+
+    print("\nSaved results to:", _write_json(current, args.output))
+    if args.save_baseline:
+        print("Saved baseline to:", _write_json(current, args.baseline))
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one.")
+        return 0
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    rows = compare(current, baseline, args.threshold)
+    print_comparison(rows, current, baseline, args.threshold)
+    regressed = [row["name"] for row in rows if row["status"] == "REGRESSED"]
+    if regressed:
+        print(f"\n{len(regressed)} case(s) regressed past {args.threshold:.0%}: {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,169 @@
+from pathlib import Path
+import os
+
+import joblib
+import numpy as np
+
+from .artifact_cache import check_fingerprints, fingerprint
+from .config import COMPILED_MODEL_DTYPE, COMPILED_MODEL_PATH, MODEL_PATH, TEST_DATA_PATH
+from .table_io import read_table
+
+
+# Saved uncompressed so joblib.load(mmap_mode="r") maps every array straight
+# from the file; worker processes then share the same page-cache pages.
+ARRAY_ATTRIBUTES = ["roots", "feature", "threshold", "left", "right", "value", "classes_", "feature_importances_"]
+SCALAR_ATTRIBUTES = ["n_features_in_", "n_trees", "depth"]
+
+
+def _float32_thresholds(thresholds: np.ndarray) -> np.ndarray:
+    # Inputs are cast to float32 before traversal, so rounding each split
+    # threshold down to the nearest float32 keeps every x <= t decision
+    # exactly as it was with the float64 threshold.
+    rounded = thresholds.astype(np.float32)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+class CompiledForest:
+    def __init__(self, model, chunk_size: int = 4096, dtype: str = "float64"):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        n_classes = len(model.classes_)
+
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+        self.feature_importances_ = model.feature_importances_
+        if hasattr(model, "feature_names_in_"):
+            self.feature_names_in_ = model.feature_names_in_
+        self.n_trees = len(trees)
+        self.depth = max(tree.max_depth for tree in trees)
+        self.chunk_size = chunk_size
+
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees[:-1]])
+        features, thresholds, lefts, rights, values = [], [], [], [], []
+        for offset, tree in zip(offsets, trees):
+            node_ids = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == -1
+
+            # Leaves point at themselves so every row can take exactly
+            # `depth` steps regardless of where its path ends.
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+            leaf_values = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = leaf_values.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(leaf_values / normalizer)
+
+        self.roots = np.ascontiguousarray(offsets, dtype=np.intp)
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        threshold = np.concatenate(thresholds)
+        if np.dtype(dtype) == np.float32:
+            threshold = _float32_thresholds(threshold)
+        self.threshold = np.ascontiguousarray(threshold)
+        self.left = np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.concatenate(rights), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=dtype)
+
+    def save(self, path, source_path=MODEL_PATH) -> Path:
+        path = Path(path)
+        state = {name: getattr(self, name) for name in ARRAY_ATTRIBUTES + SCALAR_ATTRIBUTES}
+        state["feature_names_in_"] = getattr(self, "feature_names_in_", None)
+        state["source"] = fingerprint(Path(source_path))
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        joblib.dump(state, tmp_path)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap_mode: str | None = "r", chunk_size: int = 4096) -> "CompiledForest":
+        state = joblib.load(path, mmap_mode=mmap_mode)
+        forest = cls.__new__(cls)
+        for name in ARRAY_ATTRIBUTES + SCALAR_ATTRIBUTES:
+            setattr(forest, name, state[name])
+        if state.get("feature_names_in_") is not None:
+            forest.feature_names_in_ = state["feature_names_in_"]
+        forest.source = state.get("source")
+        forest.chunk_size = chunk_size
+        return forest
+
+    def _proba_chunk(self, X: np.ndarray) -> np.ndarray:
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes].sum(axis=1, dtype=np.float64) / self.n_trees
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.shape[0] <= self.chunk_size:
+            return self._proba_chunk(X)
+        return np.concatenate(
+            [
+                self._proba_chunk(X[start:start + self.chunk_size])
+                for start in range(0, X.shape[0], self.chunk_size)
+            ]
+        )
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def check_equivalence(model, compiled: CompiledForest, data_path=TEST_DATA_PATH, atol: float = 1e-12) -> dict:
+    if hasattr(model, "feature_names_in_"):
+        X = read_table(data_path, columns=list(model.feature_names_in_))
+    else:
+        X = read_table(data_path).drop(columns=["Delivery_Status"], errors="ignore")
+
+    expected = model.predict_proba(X)
+    actual = compiled.predict_proba(X)
+    max_abs_diff = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+    label_agreement = float(np.mean(np.argmax(expected, axis=1) == np.argmax(actual, axis=1))) if len(X) else 1.0
+
+    return {
+        "rows": int(len(X)),
+        "max_abs_diff": max_abs_diff,
+        "label_agreement": label_agreement,
+        "equivalent": bool(max_abs_diff <= atol and label_agreement == 1.0),
+    }
+
+
+def load_compiled_forest(
+    model_path=MODEL_PATH,
+    compiled_path=COMPILED_MODEL_PATH,
+    dtype=COMPILED_MODEL_DTYPE,
+    export_path=None,
+) -> CompiledForest:
+    # Maps the exported arrays when they were built from the current pickle
+    # at the requested precision; otherwise the first process to notice
+    # rebuilds and re-exports them, to export_path when given (so a caller
+    # can publish the export only once the model is accepted).
+    compiled_path = Path(compiled_path)
+    if compiled_path.exists():
+        try:
+            forest = CompiledForest.load(compiled_path)
+        except (OSError, ValueError, KeyError, EOFError):
+            forest = None
+        if forest is not None and forest.source is not None and forest.threshold.dtype == np.dtype(dtype):
+            if check_fingerprints({"model": forest.source}, {"model": Path(model_path)}) is not None:
+                return forest
+
+    export_path = Path(export_path or compiled_path)
+    CompiledForest(joblib.load(model_path), dtype=dtype).save(export_path, model_path)
+    return CompiledForest.load(export_path)
+
+
+if __name__ == "__main__":
+    sklearn_model = joblib.load(MODEL_PATH)
+    compiled = CompiledForest(sklearn_model, dtype=COMPILED_MODEL_DTYPE)
+    report = check_equivalence(sklearn_model, compiled, atol=1e-12 if COMPILED_MODEL_DTYPE == "float64" else 1e-6)
+    print("Checked compiled forest against:", TEST_DATA_PATH)
+    print(report)
+    if not report["equivalent"]:
+        raise SystemExit(1)
+    print("Exported memory-mappable forest to:", compiled.save(COMPILED_MODEL_PATH))
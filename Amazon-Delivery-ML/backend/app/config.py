@@ -4,11 +4,79 @@ import os
 
 BASE_DIR = Path(__file__).resolve().parents[2]
 MODEL_PATH = BASE_DIR / "final_model.pkl"
+ENCODER_PATH = BASE_DIR / "feature_encoder.json"
+COMPILED_MODEL_PATH = BASE_DIR / "final_model.compiled.joblib"
+RAW_DATA_PATH = BASE_DIR / "Delivery_Logistics.csv"
 FEATURE_DATA_PATH = BASE_DIR / "data" / "feature_data.csv"
 CLEAN_DATA_PATH = BASE_DIR / "data" / "clean_data.csv"
 BALANCED_TRAIN_PATH = BASE_DIR / "data" / "train_test_data" / "balanced_train.csv"
+TEST_DATA_PATH = BASE_DIR / "data" / "train_test_data" / "test_data.csv"
 METRICS_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "model_metrics.json"
-HISTORY_DB_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "history.db"
+# The server's databases are overridable so load tests can run against
+# scratch copies.
+HISTORY_DB_PATH = Path(os.getenv("HISTORY_DB_PATH", "") or BASE_DIR / "backend" / "app" / "artifacts" / "history.db")
+DASHBOARD_AGGREGATES_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "dashboard_aggregates.json"
+EVALUATION_CACHE_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "evaluation_cache.json"
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH", "") or BASE_DIR / "backend" / "app" / "artifacts" / "jobs.db")
+JOBS_DIR = Path(os.getenv("JOBS_DIR", "") or BASE_DIR / "backend" / "app" / "artifacts" / "jobs")
+SHADOW_DB_PATH = Path(os.getenv("SHADOW_DB_PATH", "") or BASE_DIR / "backend" / "app" / "artifacts" / "shadow.db")
+COMPACTION_REPORT_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "compaction_report.json"
+TUNING_RESULTS_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "tuning_results.json"
+TUNING_CACHE_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "tuning_cache.joblib"
+BENCHMARK_RESULTS_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "benchmark_results.json"
+BENCHMARK_BASELINE_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "benchmark_baseline.json"
+LOADTEST_RESULTS_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "loadtest_results.json"
+PIPELINE_STATE_PATH = BASE_DIR / "backend" / "app" / "artifacts" / "pipeline_state.json"
+
+# "sklearn" serves the pickled estimator as-is; "compiled" flattens the forest
+# into numpy arrays (see compiled_forest.py).
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "sklearn")
+# Precision of the compiled split thresholds and leaf values: "float32"
+# halves those arrays without changing any split decision.
+COMPILED_MODEL_DTYPE = os.getenv("COMPILED_MODEL_DTYPE", "float64")
+
+# Hot reload: poll final_model.pkl/feature_encoder.json every N seconds (0
+# disables the watcher; POST /api/model/reload still works) and only swap in
+# a candidate that scores at least MIN_ACCURACY on the first HOLDOUT_ROWS
+# rows of test_data.
+MODEL_RELOAD_INTERVAL_SECONDS = float(os.getenv("MODEL_RELOAD_INTERVAL_SECONDS", "5"))
+MODEL_RELOAD_HOLDOUT_ROWS = int(os.getenv("MODEL_RELOAD_HOLDOUT_ROWS", "500"))
+MODEL_RELOAD_MIN_ACCURACY = float(os.getenv("MODEL_RELOAD_MIN_ACCURACY", "0.6"))
+
+# Opt-in coalescing of concurrent /api/predict calls into one model call.
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "false").lower() in ("1", "true", "yes")
+MICRO_BATCH_WINDOW_MS = float(os.getenv("MICRO_BATCH_WINDOW_MS", "2"))
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "64"))
+
+# LRU cache of /api/predict results; 0 entries disables it. Rounding digits
+# (empty = exact) let near-identical numeric inputs share an entry.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+PREDICTION_CACHE_ROUND_DIGITS = (
+    int(os.getenv("PREDICTION_CACHE_ROUND_DIGITS")) if os.getenv("PREDICTION_CACHE_ROUND_DIGITS") else None
+)
+
+# prediction_history rows are queued and written by a background thread in
+# grouped transactions; disable to write synchronously on the request path.
+HISTORY_ASYNC_WRITES = os.getenv("HISTORY_ASYNC_WRITES", "true").lower() in ("1", "true", "yes")
+HISTORY_FLUSH_INTERVAL_MS = float(os.getenv("HISTORY_FLUSH_INTERVAL_MS", "50"))
+HISTORY_FLUSH_MAX_ROWS = int(os.getenv("HISTORY_FLUSH_MAX_ROWS", "1000"))
+
+# Rows parsed and scored per chunk when /api/predict/batch streams its output.
+BATCH_CHUNK_ROWS = int(os.getenv("BATCH_CHUNK_ROWS", "5000"))
+
+# Background batch jobs: scoring processes per server process, jobs executing
+# at once across all server processes sharing jobs.db, and the cap on queued +
+# running jobs accepted from clients.
+BATCH_JOBS_WORKERS = int(os.getenv("BATCH_JOBS_WORKERS", str(os.cpu_count() or 1)))
+BATCH_JOBS_MAX_RUNNING = int(os.getenv("BATCH_JOBS_MAX_RUNNING", "2"))
+BATCH_JOBS_MAX_ACTIVE = int(os.getenv("BATCH_JOBS_MAX_ACTIVE", "10"))
+
+# Shadow scoring: a candidate model scores copies of live traffic on a
+# background thread. Empty SHADOW_MODEL_PATH disables it; a full queue drops
+# work instead of blocking the request.
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH", "")
+SHADOW_ENCODER_PATH = os.getenv("SHADOW_ENCODER_PATH", "") or str(ENCODER_PATH)
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "1000"))
 
 JWT_SECRET = os.getenv("JWT_SECRET", "amazon-supply-chain-intelligence-secret")
 JWT_ALGORITHM = "HS256"
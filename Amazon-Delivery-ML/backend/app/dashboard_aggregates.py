@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .artifact_cache import FingerprintedArtifact
+from .config import CLASS_MAP, CLEAN_DATA_PATH, DASHBOARD_AGGREGATES_PATH, FEATURE_DATA_PATH
+from .model_registry import get_model_registry, handle_versions
+from .table_io import read_table, resolve_table
+
+
+def _input_paths() -> dict[str, Path]:
+    return {
+        "feature_data": resolve_table(FEATURE_DATA_PATH),
+        "clean_data": resolve_table(CLEAN_DATA_PATH),
+    }
+
+
+def _input_versions() -> dict:
+    return handle_versions(get_model_registry().current())
+
+
+def target_distribution(status: pd.Series) -> dict[str, int]:
+    counts = status.map(CLASS_MAP).value_counts().to_dict()
+    return {label: int(counts.get(label, 0)) for label in CLASS_MAP.values()}
+
+
+def build_aggregates() -> dict:
+    status = read_table(FEATURE_DATA_PATH, columns=["Delivery_Status"])["Delivery_Status"]
+
+    avg_distance = 0.0
+    avg_processing_time = 0.0
+    if resolve_table(CLEAN_DATA_PATH).exists():
+        clean_df = read_table(CLEAN_DATA_PATH, columns=["distance_km", "delivery_cost"])
+        if not clean_df.empty:
+            avg_distance = round(float(clean_df["distance_km"].mean()), 2)
+            avg_processing_time = round(float(clean_df["delivery_cost"].mean() / 50), 2)
+
+    # The served model, so the dashboard matches what /predict uses.
+    handle = get_model_registry().current()
+    feature_names = handle.encoder.feature_columns
+    importances = getattr(handle.model, "feature_importances_", np.zeros(len(feature_names)))
+    pairs = sorted(zip(feature_names, importances), key=lambda item: item[1], reverse=True)
+
+    return {
+        "total_orders": int(len(status)),
+        "risk_distribution": target_distribution(status),
+        "avg_distance": avg_distance,
+        "avg_processing_time": avg_processing_time,
+        "feature_importance": [
+            {"feature": name, "importance": round(float(value), 4)} for name, value in pairs
+        ],
+    }
+
+
+_aggregates = FingerprintedArtifact(lambda: DASHBOARD_AGGREGATES_PATH, _input_paths, build_aggregates, _input_versions)
+
+
+def get_dashboard_aggregates() -> dict:
+    return _aggregates.get()
+
+
+if __name__ == "__main__":
+    result = _aggregates.rebuild()
+    print("Saved dashboard aggregates to:", DASHBOARD_AGGREGATES_PATH)
+    print({key: value for key, value in result.items() if key != "feature_importance"})
@@ -1,9 +1,34 @@
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 import json
+import queue
+import sys
+import threading
+import time
 
-from .config import HISTORY_DB_PATH
+from .config import (
+    HISTORY_ASYNC_WRITES,
+    HISTORY_DB_PATH,
+    HISTORY_FLUSH_INTERVAL_MS,
+    HISTORY_FLUSH_MAX_ROWS,
+)
+
+
+INSERT_HISTORY_SQL = """
+    INSERT INTO prediction_history
+    (username, created_at, request_payload, prediction_label, prediction_id, confidence, model_version)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Bucket key = prefix of the ISO created_at: "YYYY-MM-DD" or "YYYY-MM-DDTHH".
+ROLLUP_TABLES = {
+    "day": ("prediction_rollup_daily", 10),
+    "hour": ("prediction_rollup_hourly", 13),
+}
+
+_STOP = object()
 
 
 def _get_conn() -> sqlite3.Connection:
@@ -15,6 +40,7 @@ def _get_conn() -> sqlite3.Connection:
 
 def init_db() -> None:
     conn = _get_conn()
+    conn.execute("PRAGMA journal_mode=WAL")
     conn.execute(
         """
         CREATE TABLE IF NOT EXISTS prediction_history (
@@ -24,65 +50,383 @@ def init_db() -> None:
             request_payload TEXT NOT NULL,
             prediction_label TEXT NOT NULL,
             prediction_id INTEGER NOT NULL,
-            confidence REAL NOT NULL
+            confidence REAL NOT NULL,
+            model_version TEXT
         )
         """
     )
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(prediction_history)")}
+    if "model_version" not in columns:
+        conn.execute("ALTER TABLE prediction_history ADD COLUMN model_version TEXT")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_history_username_id ON prediction_history (username, id)"
+    )
+    # /api/history always filters by username, so the label and date filters
+    # are indexed behind it.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_history_username_label_id ON prediction_history (username, prediction_label, id)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_history_username_created_at ON prediction_history (username, created_at, id)"
+    )
+    for table, _ in ROLLUP_TABLES.values():
+        conn.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                prediction_label TEXT NOT NULL,
+                prediction_count INTEGER NOT NULL,
+                confidence_sum REAL NOT NULL,
+                PRIMARY KEY (bucket, prediction_label)
+            )
+            """
+        )
     conn.commit()
+    _backfill_rollups(conn)
     conn.close()
 
 
+def _backfill_rollups(conn: sqlite3.Connection) -> None:
+    # One-off rebuild for databases that predate the rollup tables.
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for table, width in ROLLUP_TABLES.values():
+            if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+                continue
+            conn.execute(
+                f"""
+                INSERT INTO {table} (bucket, prediction_label, prediction_count, confidence_sum)
+                SELECT substr(created_at, 1, {width}), prediction_label, COUNT(*), SUM(confidence)
+                FROM prediction_history
+                GROUP BY substr(created_at, 1, {width}), prediction_label
+                """
+            )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _history_row(
+    username: str,
+    request_payload: dict,
+    prediction_label: str,
+    prediction_id: int,
+    confidence: float,
+    model_version: str | None = None,
+) -> tuple:
+    return (
+        username,
+        datetime.utcnow().isoformat(),
+        json.dumps(request_payload),
+        prediction_label,
+        prediction_id,
+        confidence,
+        model_version,
+    )
+
+
+def _rollup_increments(rows: list[tuple], width: int) -> list[tuple]:
+    totals: dict[tuple, list] = {}
+    for _, created_at, _, prediction_label, _, confidence, _ in rows:
+        entry = totals.setdefault((created_at[:width], prediction_label), [0, 0.0])
+        entry[0] += 1
+        entry[1] += confidence
+    return [(bucket, label, count, confidence_sum) for (bucket, label), (count, confidence_sum) in totals.items()]
+
+
+def _write_rows(conn: sqlite3.Connection, rows: list[tuple]) -> None:
+    with conn:
+        conn.executemany(INSERT_HISTORY_SQL, rows)
+        for table, width in ROLLUP_TABLES.values():
+            conn.executemany(
+                f"""
+                INSERT INTO {table} (bucket, prediction_label, prediction_count, confidence_sum)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (bucket, prediction_label) DO UPDATE SET
+                    prediction_count = prediction_count + excluded.prediction_count,
+                    confidence_sum = confidence_sum + excluded.confidence_sum
+                """,
+                _rollup_increments(rows, width),
+            )
+
+
+class HistoryWriter:
+    # A batch that keeps failing (e.g. "database is locked") is retried with
+    # backoff, then dropped and counted so the writer keeps draining.
+    WRITE_ATTEMPTS = 3
+    RETRY_DELAY_SECONDS = 0.1
+
+    def __init__(self, flush_interval_ms: float, max_batch_rows: int):
+        self.flush_interval_ms = flush_interval_ms
+        self.max_batch_rows = max(1, max_batch_rows)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # Held while enqueueing and while the writer closes its queue, so a
+        # row is either drained by the thread or written inline, never lost.
+        self._submit_lock = threading.Lock()
+        self._accepting = False
+        self._flushes = 0
+        self._rows_written = 0
+        self._failed_rows = 0
+        self._last_error: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        with self._submit_lock:
+            self._accepting = True
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        with self._submit_lock:
+            self._accepting = False
+            self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+    def submit(self, rows: list[tuple]) -> None:
+        if not rows:
+            return
+        with self._submit_lock:
+            if self._accepting:
+                self._queue.put(rows)
+                return
+            conn = _get_conn()
+            try:
+                _write_rows(conn, rows)
+            finally:
+                conn.close()
+
+    def flush(self) -> None:
+        self._queue.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "pending_batches": self._queue.qsize(),
+                "flushes": self._flushes,
+                "rows_written": self._rows_written,
+                "failed_rows": self._failed_rows,
+                "last_error": self._last_error,
+            }
+
+    def _collect(self, first: list[tuple]) -> tuple[list[tuple], int, bool]:
+        rows = list(first)
+        taken = 1
+        deadline = time.monotonic() + self.flush_interval_ms / 1000
+        while len(rows) < self.max_batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            taken += 1
+            if item is _STOP:
+                return rows, taken, True
+            rows.extend(item)
+        return rows, taken, False
+
+    def _write_batch(self, conn: sqlite3.Connection, rows: list[tuple]) -> None:
+        for attempt in range(self.WRITE_ATTEMPTS):
+            try:
+                _write_rows(conn, rows)
+            except Exception as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                if attempt + 1 < self.WRITE_ATTEMPTS:
+                    time.sleep(self.RETRY_DELAY_SECONDS * 2 ** attempt)
+            else:
+                with self._lock:
+                    self._flushes += 1
+                    self._rows_written += len(rows)
+                return
+        with self._lock:
+            self._failed_rows += len(rows)
+            self._last_error = error
+        print(f"History writer dropped {len(rows)} rows: {error}", file=sys.stderr)
+
+    def _run(self) -> None:
+        conn = None
+        try:
+            conn = _get_conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                taken = 1
+                try:
+                    if item is _STOP:
+                        break
+                    rows, taken, stopping = self._collect(item)
+                    self._write_batch(conn, rows)
+                finally:
+                    for _ in range(taken):
+                        self._queue.task_done()
+        finally:
+            # On stop or on an unexpected exit: stop accepting, then drain
+            # whatever was queued. Later submits write inline.
+            with self._submit_lock:
+                self._accepting = False
+                leftovers, taken = [], 0
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    taken += 1
+                    if item is not _STOP:
+                        leftovers.extend(item)
+                try:
+                    if leftovers:
+                        conn = conn or _get_conn()
+                        self._write_batch(conn, leftovers)
+                finally:
+                    for _ in range(taken):
+                        self._queue.task_done()
+                    if conn is not None:
+                        conn.close()
+
+
+@lru_cache
+def get_history_writer() -> HistoryWriter:
+    return HistoryWriter(
+        flush_interval_ms=HISTORY_FLUSH_INTERVAL_MS,
+        max_batch_rows=HISTORY_FLUSH_MAX_ROWS,
+    )
+
+
+def start_history_writer() -> None:
+    if HISTORY_ASYNC_WRITES:
+        get_history_writer().start()
+
+
+def stop_history_writer() -> None:
+    get_history_writer().stop()
+
+
 def insert_history(
     username: str,
     request_payload: dict,
     prediction_label: str,
     prediction_id: int,
     confidence: float,
+    model_version: str | None = None,
 ) -> None:
-    conn = _get_conn()
-    conn.execute(
-        """
-        INSERT INTO prediction_history
-        (username, created_at, request_payload, prediction_label, prediction_id, confidence)
-        VALUES (?, ?, ?, ?, ?, ?)
-        """,
-        (
+    row = _history_row(username, request_payload, prediction_label, prediction_id, confidence, model_version)
+    get_history_writer().submit([row])
+
+
+def insert_history_many(username: str, entries: list[dict]) -> None:
+    rows = [
+        _history_row(
             username,
-            datetime.utcnow().isoformat(),
-            json.dumps(request_payload),
-            prediction_label,
-            prediction_id,
-            confidence,
-        ),
-    )
-    conn.commit()
-    conn.close()
+            entry["request_payload"],
+            entry["prediction_label"],
+            entry["prediction_id"],
+            entry["confidence"],
+            entry.get("model_version"),
+        )
+        for entry in entries
+    ]
+    get_history_writer().submit(rows)
+
+
+def fetch_history(
+    limit: int = 100,
+    before_id: int | None = None,
+    username: str | None = None,
+    created_from: str | None = None,
+    created_to: str | None = None,
+    prediction_label: str | None = None,
+    include_payload: bool = True,
+) -> list[dict]:
+    columns = ["id", "username", "created_at", "prediction_label", "prediction_id", "confidence", "model_version"]
+    if include_payload:
+        columns.append("request_payload")
 
+    conditions = []
+    params: list = []
+    if before_id is not None:
+        conditions.append("id < ?")
+        params.append(before_id)
+    if username is not None:
+        conditions.append("username = ?")
+        params.append(username)
+    if created_from is not None:
+        conditions.append("created_at >= ?")
+        params.append(created_from)
+    if created_to is not None:
+        conditions.append("created_at < ?")
+        params.append(created_to)
+    if prediction_label is not None:
+        conditions.append("prediction_label = ?")
+        params.append(prediction_label)
 
-def fetch_history(limit: int = 100) -> list[dict]:
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
     conn = _get_conn()
     rows = conn.execute(
-        """
-        SELECT id, username, created_at, request_payload, prediction_label, prediction_id, confidence
+        f"""
+        SELECT {', '.join(columns)}
         FROM prediction_history
+        {where}
         ORDER BY id DESC
         LIMIT ?
         """,
-        (limit,),
+        (*params, limit),
     ).fetchall()
     conn.close()
 
     output = []
     for row in rows:
-        output.append(
-            {
-                "id": row["id"],
-                "username": row["username"],
-                "created_at": row["created_at"],
-                "request_payload": json.loads(row["request_payload"]),
-                "prediction_label": row["prediction_label"],
-                "prediction_id": row["prediction_id"],
-                "confidence": row["confidence"],
-            }
-        )
+        item = {
+            "id": row["id"],
+            "username": row["username"],
+            "created_at": row["created_at"],
+            "prediction_label": row["prediction_label"],
+            "prediction_id": row["prediction_id"],
+            "confidence": row["confidence"],
+            "model_version": row["model_version"],
+        }
+        if include_payload:
+            item["request_payload"] = json.loads(row["request_payload"])
+        output.append(item)
     return output
+
+
+def fetch_rollups(days: int = 7, granularity: str = "day") -> list[dict]:
+    table, width = ROLLUP_TABLES[granularity]
+    start = (datetime.utcnow() - timedelta(days=days - 1)).date().isoformat()
+
+    conn = _get_conn()
+    rows = conn.execute(
+        f"""
+        SELECT bucket, prediction_label, prediction_count, confidence_sum
+        FROM {table}
+        WHERE bucket >= ?
+        ORDER BY bucket
+        """,
+        (start[:width],),
+    ).fetchall()
+    conn.close()
+
+    return [
+        {
+            "bucket": row["bucket"],
+            "prediction_label": row["prediction_label"],
+            "prediction_count": row["prediction_count"],
+            "confidence_sum": row["confidence_sum"],
+        }
+        for row in rows
+    ]
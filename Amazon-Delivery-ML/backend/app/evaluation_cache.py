@@ -0,0 +1,104 @@
+from pathlib import Path
+
+from sklearn.metrics import confusion_matrix
+from sklearn.model_selection import train_test_split
+
+from .artifact_cache import FingerprintedArtifact
+from .config import BALANCED_TRAIN_PATH, CLASS_MAP, EVALUATION_CACHE_PATH, FEATURE_DATA_PATH
+from .dashboard_aggregates import get_dashboard_aggregates, target_distribution
+from .model_registry import get_model_registry, handle_versions
+from .table_io import read_table, resolve_table, table_columns
+
+
+def _input_paths() -> dict[str, Path]:
+    return {
+        "feature_data": resolve_table(FEATURE_DATA_PATH),
+        "balanced_train": resolve_table(BALANCED_TRAIN_PATH),
+    }
+
+
+def _input_versions() -> dict:
+    return handle_versions(get_model_registry().current())
+
+
+def build_evaluation() -> dict:
+    df = read_table(FEATURE_DATA_PATH)
+    X = df.drop(columns=["Delivery_Status"])
+    y = df["Delivery_Status"]
+
+    _, X_test, _, y_test = train_test_split(
+        X,
+        y,
+        test_size=0.2,
+        stratify=y,
+        random_state=42,
+    )
+
+    handle = get_model_registry().current()
+    y_pred = handle.model.predict(X_test[handle.encoder.feature_columns])
+    matrix = confusion_matrix(y_test, y_pred, labels=[0, 1, 2]).tolist()
+
+    before_counts = target_distribution(y)
+    after_counts = before_counts
+    if resolve_table(BALANCED_TRAIN_PATH).exists():
+        balanced_columns = table_columns(BALANCED_TRAIN_PATH)
+        if "sample_weight" in balanced_columns:
+            # Balanced by weight (imbalance_handler method="weights"): report
+            # each class's effective size.
+            balanced = read_table(BALANCED_TRAIN_PATH, columns=["Delivery_Status", "sample_weight"])
+            weighted = balanced.groupby("Delivery_Status")["sample_weight"].sum()
+            after_counts = {label: int(round(weighted.get(class_id, 0.0))) for class_id, label in CLASS_MAP.items()}
+        elif "Delivery_Status" in balanced_columns:
+            balanced_status = read_table(BALANCED_TRAIN_PATH, columns=["Delivery_Status"])
+            after_counts = target_distribution(balanced_status["Delivery_Status"])
+
+    corr_rows = []
+    for class_id, class_name in CLASS_MAP.items():
+        class_subset = df[df["Delivery_Status"] == class_id]
+        corr_rows.append(
+            {
+                "label": class_name,
+                "avg_processing_proxy": round(float(class_subset["Complexity_Score"].mean()), 2),
+                "avg_distance": round(float(class_subset["distance_km"].mean()), 2),
+            }
+        )
+
+    scatter = (
+        df[["distance_km", "Complexity_Score", "Delivery_Status"]]
+        .sample(min(500, len(df)), random_state=42)
+        .copy()
+    )
+    scatter["label"] = scatter["Delivery_Status"].map(CLASS_MAP)
+
+    return {
+        "confusion_matrix": {
+            "labels": ["On-Time", "At Risk", "Delayed"],
+            "values": matrix,
+        },
+        "class_distribution": {
+            "before_smote": before_counts,
+            "after_smote": after_counts,
+        },
+        "processing_vs_risk": corr_rows,
+        "distance_vs_risk": scatter[["distance_km", "Complexity_Score", "label"]].to_dict(orient="records"),
+    }
+
+
+_evaluation = FingerprintedArtifact(lambda: EVALUATION_CACHE_PATH, _input_paths, build_evaluation, _input_versions)
+
+
+def get_evaluation() -> dict:
+    evaluation = _evaluation.get()
+    return {
+        "confusion_matrix": evaluation["confusion_matrix"],
+        "feature_importance": get_dashboard_aggregates()["feature_importance"][:8],
+        "class_distribution": evaluation["class_distribution"],
+        "processing_vs_risk": evaluation["processing_vs_risk"],
+        "distance_vs_risk": evaluation["distance_vs_risk"],
+    }
+
+
+if __name__ == "__main__":
+    result = _evaluation.rebuild()
+    print("Saved evaluation cache to:", EVALUATION_CACHE_PATH)
+    print(result["confusion_matrix"])
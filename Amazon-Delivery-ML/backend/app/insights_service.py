@@ -1,35 +1,26 @@
-from functools import lru_cache
+from datetime import datetime, timedelta
 from io import StringIO
 
 import numpy as np
 import pandas as pd
-from sklearn.metrics import confusion_matrix
-from sklearn.model_selection import train_test_split
 
-from .config import BALANCED_TRAIN_PATH, CLASS_MAP, CLEAN_DATA_PATH, FEATURE_DATA_PATH
-from .predictor import load_model
+from .config import CLASS_MAP
+from .dashboard_aggregates import get_dashboard_aggregates
+from .database import fetch_rollups
+from .evaluation_cache import get_evaluation
+from .predictor import current_model, encode_frame, predict
+from .shadow_scoring import submit_shadow
 
 
-@lru_cache
-def _load_feature_data() -> pd.DataFrame:
-    return pd.read_csv(FEATURE_DATA_PATH)
-
-
-@lru_cache
-def _load_clean_data() -> pd.DataFrame:
-    if CLEAN_DATA_PATH.exists():
-        return pd.read_csv(CLEAN_DATA_PATH)
-    return pd.DataFrame()
-
-
-def _target_distribution(df: pd.DataFrame) -> dict[str, int]:
-    labels = df["Delivery_Status"].map(CLASS_MAP)
-    counts = labels.value_counts().to_dict()
-    return {
-        "On-Time": int(counts.get("On-Time", 0)),
-        "At Risk": int(counts.get("At Risk", 0)),
-        "Delayed": int(counts.get("Delayed", 0)),
-    }
+UPLOAD_WEATHER_MAP = {
+    "clear": "clear",
+    "rain": "rainy",
+    "rainy": "rainy",
+    "storm": "stormy",
+    "stormy": "stormy",
+    "fog": "foggy",
+    "foggy": "foggy",
+}
 
 
 def _risk_percentages(distribution: dict[str, int]) -> dict[str, float]:
@@ -37,108 +28,68 @@ def _risk_percentages(distribution: dict[str, int]) -> dict[str, float]:
     return {key: round((value / total) * 100, 2) for key, value in distribution.items()}
 
 
-def _recent_trend() -> list[dict]:
+def _trend_buckets(days: int, granularity: str) -> list[str]:
+    now = datetime.utcnow()
+    if granularity == "hour":
+        start = datetime(now.year, now.month, now.day) - timedelta(days=days - 1)
+        hours = int((now - start).total_seconds() // 3600) + 1
+        return [(start + timedelta(hours=hour)).strftime("%Y-%m-%dT%H") for hour in range(hours)]
+    today = now.date()
+    return [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+
+
+def _recent_trend(days: int = 7, granularity: str = "day") -> list[dict]:
+    totals = {
+        bucket: {"count": 0, "confidence_sum": 0.0, "labels": {}}
+        for bucket in _trend_buckets(days, granularity)
+    }
+    for row in fetch_rollups(days=days, granularity=granularity):
+        entry = totals.get(row["bucket"])
+        if entry is None:
+            continue
+        entry["count"] += row["prediction_count"]
+        entry["confidence_sum"] += row["confidence_sum"]
+        entry["labels"][row["prediction_label"]] = row["prediction_count"]
+
     timeline = []
-    for day in range(1, 8):
+    for bucket, entry in totals.items():
+        percentages = _risk_percentages(
+            {label: int(entry["labels"].get(label, 0)) for label in CLASS_MAP.values()}
+        )
         timeline.append(
             {
-                "day": f"Day {day}",
-                "On-Time": max(60, 78 - day),
-                "At Risk": min(30, 15 + day),
-                "Delayed": min(20, 7 + int(day * 0.7)),
+                "day": bucket,
+                **percentages,
+                "predictions": entry["count"],
+                "avg_confidence": round(entry["confidence_sum"] / entry["count"], 4) if entry["count"] else 0.0,
             }
         )
     return timeline
 
 
-def _feature_impact() -> list[dict]:
-    model = load_model()
-    feature_names = list(_load_feature_data().drop(columns=["Delivery_Status"]).columns)
-    importances = getattr(model, "feature_importances_", np.zeros(len(feature_names)))
-    pairs = sorted(zip(feature_names, importances), key=lambda item: item[1], reverse=True)[:8]
-    return [{"feature": name, "importance": round(float(value), 4)} for name, value in pairs]
-
-
-def get_dashboard_overview() -> dict:
-    df = _load_feature_data()
-    clean_df = _load_clean_data()
+def get_dashboard_overview(trend_days: int = 7, trend_granularity: str = "day") -> dict:
+    aggregates = get_dashboard_aggregates()
 
-    distribution = _target_distribution(df)
+    distribution = aggregates["risk_distribution"]
     percentages = _risk_percentages(distribution)
 
-    avg_distance = round(float(clean_df["distance_km"].mean()), 2) if not clean_df.empty else 0.0
-    avg_processing_time = round(float(clean_df["delivery_cost"].mean() / 50), 2) if not clean_df.empty else 0.0
-
     return {
         "kpis": {
-            "total_orders": int(len(df)),
+            "total_orders": aggregates["total_orders"],
             "on_time_pct": percentages["On-Time"],
             "at_risk_pct": percentages["At Risk"],
             "delayed_pct": percentages["Delayed"],
-            "avg_processing_time": avg_processing_time,
-            "avg_shipment_distance": avg_distance,
+            "avg_processing_time": aggregates["avg_processing_time"],
+            "avg_shipment_distance": aggregates["avg_distance"],
         },
         "risk_distribution": distribution,
-        "risk_trend": _recent_trend(),
-        "feature_impact": _feature_impact(),
+        "risk_trend": _recent_trend(trend_days, trend_granularity),
+        "feature_impact": aggregates["feature_importance"][:8],
     }
 
 
 def get_analytics_data() -> dict:
-    df = _load_feature_data()
-    X = df.drop(columns=["Delivery_Status"])
-    y = df["Delivery_Status"]
-
-    _, X_test, _, y_test = train_test_split(
-        X,
-        y,
-        test_size=0.2,
-        stratify=y,
-        random_state=42,
-    )
-
-    model = load_model()
-    y_pred = model.predict(X_test)
-    matrix = confusion_matrix(y_test, y_pred, labels=[0, 1, 2]).tolist()
-
-    before_counts = _target_distribution(df)
-    after_counts = before_counts
-    if BALANCED_TRAIN_PATH.exists():
-        balanced_df = pd.read_csv(BALANCED_TRAIN_PATH)
-        if "Delivery_Status" in balanced_df.columns:
-            after_counts = _target_distribution(balanced_df)
-
-    corr_rows = []
-    for class_id, class_name in CLASS_MAP.items():
-        class_subset = df[df["Delivery_Status"] == class_id]
-        corr_rows.append(
-            {
-                "label": class_name,
-                "avg_processing_proxy": round(float(class_subset["Complexity_Score"].mean()), 2),
-                "avg_distance": round(float(class_subset["distance_km"].mean()), 2),
-            }
-        )
-
-    scatter = (
-        df[["distance_km", "Complexity_Score", "Delivery_Status"]]
-        .sample(min(500, len(df)), random_state=42)
-        .copy()
-    )
-    scatter["label"] = scatter["Delivery_Status"].map(CLASS_MAP)
-
-    return {
-        "confusion_matrix": {
-            "labels": ["On-Time", "At Risk", "Delayed"],
-            "values": matrix,
-        },
-        "feature_importance": _feature_impact(),
-        "class_distribution": {
-            "before_smote": before_counts,
-            "after_smote": after_counts,
-        },
-        "processing_vs_risk": corr_rows,
-        "distance_vs_risk": scatter[["distance_km", "Complexity_Score", "label"]].to_dict(orient="records"),
-    }
+    return get_evaluation()
 
 
 def _map_upload_payload(row: dict) -> dict:
@@ -158,23 +109,13 @@ def _map_upload_payload(row: dict) -> dict:
     warehouse_time = max(1.0, float(row.get("warehouse_time", 1)))
     delivery_cost = round((distance * 4.2) + (package_weight * 18.0) + (warehouse_time * 5.5), 2)
 
-    weather_map = {
-        "clear": "clear",
-        "rain": "rainy",
-        "rainy": "rainy",
-        "storm": "stormy",
-        "stormy": "stormy",
-        "fog": "foggy",
-        "foggy": "foggy",
-    }
-
     return {
         "delivery_partner": "delhivery",
         "package_type": "electronics",
         "vehicle_type": "bike",
         "delivery_mode": mode,
         "region": region,
-        "weather_condition": weather_map.get(weather, "clear"),
+        "weather_condition": UPLOAD_WEATHER_MAP.get(weather, "clear"),
         "distance_km": distance,
         "package_weight_kg": package_weight,
         "delivery_rating": rating,
@@ -182,11 +123,41 @@ def _map_upload_payload(row: dict) -> dict:
     }
 
 
+def _map_upload_frame(df: pd.DataFrame) -> pd.DataFrame:
+    traffic_level = df["traffic_level"].astype(str).str.lower().str.strip()
+    weather = df["weather_indicator"].astype(str).str.lower().str.strip()
+    historical = df["historical_performance"].astype(float).to_numpy()
+
+    rating = np.where(historical <= 1, historical * 5, historical)
+    rating = np.nan_to_num(np.clip(rating, 1.0, 5.0), nan=5.0)
+
+    package_weight = np.fmax(0.5, df["order_volume"].astype(float).to_numpy() / 10)
+    distance = np.fmax(1.0, df["shipment_distance"].astype(float).to_numpy())
+    warehouse_time = np.fmax(1.0, df["warehouse_time"].astype(float).to_numpy())
+    delivery_cost = np.round((distance * 4.2) + (package_weight * 18.0) + (warehouse_time * 5.5), 2)
+
+    rows = len(df)
+    return pd.DataFrame(
+        {
+            "delivery_partner": np.full(rows, "delhivery", dtype=object),
+            "package_type": np.full(rows, "electronics", dtype=object),
+            "vehicle_type": np.full(rows, "bike", dtype=object),
+            "delivery_mode": np.where(traffic_level.isin(["low", "medium"]), "same day", "standard"),
+            "region": np.where(traffic_level == "high", "west", "north"),
+            "weather_condition": weather.map(UPLOAD_WEATHER_MAP).fillna("clear").to_numpy(),
+            "distance_km": distance,
+            "package_weight_kg": package_weight,
+            "delivery_rating": rating,
+            "delivery_cost": delivery_cost,
+        }
+    )
+
+
 def predict_from_business_inputs(payload: dict) -> dict:
     mapped = _map_upload_payload(payload)
-    from .predictor import predict
-
-    return predict(mapped)
+    result = predict(mapped)
+    submit_shadow("live", [mapped], [result])
+    return result
 
 
 def process_uploaded_dataset(file_content: str) -> dict:
@@ -204,18 +175,12 @@ def process_uploaded_dataset(file_content: str) -> dict:
     if missing:
         raise ValueError(f"Missing columns: {missing}")
 
-    model = load_model()
-    prediction_rows = []
-    for _, row in df.iterrows():
-        mapped = _map_upload_payload(row.to_dict())
-        from .preprocessing import build_feature_frame
-
-        frame = build_feature_frame(mapped)
-        predicted = int(model.predict(frame)[0])
-        prediction_rows.append(CLASS_MAP[predicted])
+    handle = current_model()
+    predicted = handle.model.predict(encode_frame(handle, _map_upload_frame(df))) if len(df) else []
+    prediction_rows = pd.Series(predicted, dtype="int64").map(CLASS_MAP)
 
     preview = df.head(10).fillna("").to_dict(orient="records")
-    summary = pd.Series(prediction_rows).value_counts().to_dict()
+    summary = prediction_rows.value_counts().to_dict()
 
     return {
         "rows": int(len(df)),
@@ -265,12 +230,11 @@ def get_about_model() -> dict:
 
 
 def get_report_summary() -> dict:
-    overview = get_dashboard_overview()
-    analytics = get_analytics_data()
+    aggregates = get_dashboard_aggregates()
 
     return {
-        "risk_summary": overview["risk_distribution"],
+        "risk_summary": aggregates["risk_distribution"],
         "model_summary": get_about_model(),
-        "feature_impact": overview["feature_impact"],
-        "class_distribution": analytics["class_distribution"],
+        "feature_impact": aggregates["feature_importance"][:8],
+        "class_distribution": get_evaluation()["class_distribution"],
     }
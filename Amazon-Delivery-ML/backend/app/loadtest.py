@@ -0,0 +1,464 @@
+from datetime import datetime
+from pathlib import Path
+from typing import get_args
+from urllib.parse import urlsplit
+import argparse
+import http.client
+import itertools
+import json
+import os
+import queue
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from .config import BASE_DIR, DEMO_PASSWORD, DEMO_USER, LOADTEST_RESULTS_PATH
+from .schemas import PredictRequest
+
+
+DEFAULT_MIX = {
+    "predict": 40,
+    "predict_live": 15,
+    "history": 15,
+    "dashboard_overview": 10,
+    "analytics": 10,
+    "batch": 5,
+    "login": 5,
+}
+SATURATION_MIN_ACHIEVED = 0.95
+SATURATION_MAX_ERROR_RATE = 0.01
+SERVER_START_TIMEOUT_SECONDS = 120
+# Backlog still queued this long after the run ends is dropped, not sent.
+DRAIN_TIMEOUT_SECONDS = 10
+
+
+def _predict_payload(rng: random.Random) -> dict:
+    payload = {}
+    for field, info in PredictRequest.model_fields.items():
+        choices = get_args(info.annotation)
+        if choices:
+            payload[field] = rng.choice(choices)
+    payload.update(
+        {
+            "distance_km": round(rng.uniform(1, 500), 2),
+            "package_weight_kg": round(rng.uniform(0.5, 50), 2),
+            "delivery_rating": float(rng.randint(1, 5)),
+            "delivery_cost": round(rng.uniform(50, 2500), 2),
+        }
+    )
+    return payload
+
+
+def _live_payload(rng: random.Random) -> dict:
+    return {
+        "order_volume": rng.randint(1, 400),
+        "warehouse_time": round(rng.uniform(1, 48), 1),
+        "shipment_distance": round(rng.uniform(1, 800), 1),
+        "traffic_level": rng.choice(["low", "medium", "high"]),
+        "weather_indicator": rng.choice(["clear", "rain", "storm", "fog"]),
+        "historical_performance": round(rng.uniform(0.3, 1.0), 2),
+    }
+
+
+def _batch_body(rows: int, rng: random.Random) -> tuple[bytes, str]:
+    payloads = [_predict_payload(rng) for _ in range(rows)]
+    columns = list(PredictRequest.model_fields)
+    lines = [",".join(columns)] + [",".join(str(payload[column]) for column in columns) for payload in payloads]
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="loadtest.csv"\r\n'
+        "Content-Type: text/csv\r\n\r\n"
+        + "\n".join(lines)
+        + f"\r\n--{boundary}--\r\n"
+    ).encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class Client:
+    # One virtual user: a keep-alive connection and its own bearer token.
+    def __init__(self, base_url: str, batch_rows: int, seed: int):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.batch_rows = batch_rows
+        self.rng = random.Random(seed)
+        self.token: str | None = None
+        self._conn: http.client.HTTPConnection | None = None
+
+    def _request(self, method: str, path: str, body: bytes | None = None, content_type: str | None = None) -> tuple[int, bytes]:
+        headers = {}
+        if content_type:
+            headers["Content-Type"] = content_type
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self._conn.request(method, path, body=body, headers=headers)
+                response = self._conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                # The server may close an idle keep-alive connection; retry
+                # once on a fresh one before counting an error.
+                self._conn.close()
+                self._conn = None
+                if attempt:
+                    raise
+        raise RuntimeError("unreachable")
+
+    def _json(self, method: str, path: str, payload: dict) -> tuple[int, bytes]:
+        return self._request(method, path, json.dumps(payload).encode("utf-8"), "application/json")
+
+    def login(self) -> int:
+        status, body = self._json("POST", "/api/auth/login", {"username": DEMO_USER, "password": DEMO_PASSWORD})
+        if status == 200:
+            self.token = json.loads(body)["access_token"]
+        return status
+
+    def call(self, endpoint: str) -> int:
+        if endpoint == "login":
+            return self.login()
+        if endpoint == "predict":
+            return self._json("POST", "/api/predict", _predict_payload(self.rng))[0]
+        if endpoint == "predict_live":
+            return self._json("POST", "/api/predict/live", _live_payload(self.rng))[0]
+        if endpoint == "history":
+            return self._request("GET", "/api/history?limit=50")[0]
+        if endpoint == "dashboard_overview":
+            return self._request("GET", "/api/dashboard/overview")[0]
+        if endpoint == "analytics":
+            return self._request("GET", "/api/analytics")[0]
+        if endpoint == "batch":
+            body, content_type = _batch_body(self.batch_rows, self.rng)
+            return self._request("POST", "/api/predict/batch", body, content_type)[0]
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def run_load(
+    base_url: str,
+    rate: float,
+    concurrency: int,
+    duration: float,
+    mix: dict[str, float],
+    warmup: float = 5.0,
+    batch_rows: int = 100,
+    seed: int = 42,
+) -> list[dict]:
+    # Open-loop: arrivals are scheduled at `rate` per second whether or not
+    # earlier requests have finished, and latency is measured from the
+    # scheduled time, so queueing in front of a saturated server is counted
+    # instead of hidden (no coordinated omission).
+    clients = [Client(base_url, batch_rows, seed + index) for index in range(concurrency)]
+    for client in clients:
+        status = client.login()
+        if status != 200:
+            raise RuntimeError(f"Login failed with HTTP {status}")
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    picker = random.Random(seed)
+    arrivals: queue.Queue = queue.Queue()
+    records: list[list[dict]] = [[] for _ in clients]
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def dispatch() -> None:
+        for index in itertools.count():
+            scheduled = started + index / rate
+            if scheduled >= stop_at:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            arrivals.put((scheduled, picker.choices(names, weights)[0]))
+        for _ in clients:
+            arrivals.put(None)
+
+    def work(client: Client, sink: list[dict]) -> None:
+        while True:
+            item = arrivals.get()
+            if item is None:
+                break
+            scheduled, endpoint = item
+            sent = time.perf_counter()
+            if sent > stop_at + DRAIN_TIMEOUT_SECONDS:
+                if scheduled >= measure_from:
+                    sink.append({"endpoint": endpoint, "status": 0, "error": "NotSent", "late": True})
+                continue
+            try:
+                status = client.call(endpoint)
+                error = None
+            except Exception as exc:
+                status = 0
+                error = type(exc).__name__
+            finished = time.perf_counter()
+            if scheduled >= measure_from:
+                sink.append(
+                    {
+                        "endpoint": endpoint,
+                        "status": status,
+                        "error": error,
+                        "latency_ms": (finished - scheduled) * 1000,
+                        "service_ms": (finished - sent) * 1000,
+                        "late": finished > stop_at,
+                    }
+                )
+        client.close()
+
+    threads = [threading.Thread(target=dispatch, name="loadtest-dispatch", daemon=True)]
+    threads += [
+        threading.Thread(target=work, args=(client, sink), name=f"loadtest-client-{index}", daemon=True)
+        for index, (client, sink) in enumerate(zip(clients, records))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [record for sink in records for record in sink]
+
+
+def summarize(records: list[dict], duration: float, rate: float) -> dict:
+    # Throughput counts only successes completed inside the measured window,
+    # so a server that falls behind shows up as achieved < target.
+    def stats(group: list[dict]) -> dict:
+        sent = [record for record in group if record["error"] != "NotSent"]
+        latencies = np.array([record["latency_ms"] for record in sent])
+        service = np.array([record["service_ms"] for record in sent])
+        failed = [bool(record["error"]) or record["status"] >= 400 for record in group]
+        completed = sum(not bad and not record["late"] for bad, record in zip(failed, group))
+        statuses: dict[str, int] = {}
+        for record in group:
+            key = record["error"] or str(record["status"])
+            statuses[key] = statuses.get(key, 0) + 1
+        return {
+            "requests": len(group),
+            "errors": sum(failed),
+            "error_rate": round(sum(failed) / len(group), 4) if group else 0.0,
+            "throughput_rps": round(completed / duration, 2),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2) if sent else None,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2) if sent else None,
+            "p99_ms": round(float(np.percentile(latencies, 99)), 2) if sent else None,
+            "max_ms": round(float(latencies.max()), 2) if sent else None,
+            "service_p50_ms": round(float(np.percentile(service, 50)), 2) if sent else None,
+            "statuses": statuses,
+        }
+
+    endpoints = sorted({record["endpoint"] for record in records})
+    total = stats(records)
+    total["achieved_ratio"] = round(total["throughput_rps"] / rate, 4) if rate else None
+    return {
+        "total": total,
+        "endpoints": {endpoint: stats([record for record in records if record["endpoint"] == endpoint]) for endpoint in endpoints},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(base_url: str, process: subprocess.Popen, timeout: float = SERVER_START_TIMEOUT_SECONDS) -> None:
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} during startup")
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request("GET", "/api/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+            conn.close()
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"Server did not become healthy within {timeout:.0f}s")
+
+
+def start_server(workers: int, scratch_dir: Path, env_overrides: dict[str, str]) -> tuple[subprocess.Popen, str]:
+    # Every database and job directory the server writes goes to scratch_dir,
+    # so its job runner never claims real jobs and shadow rows stay out of
+    # the real shadow.db.
+    port = _free_port()
+    scratch_dir.mkdir(parents=True, exist_ok=True)
+    env = {
+        **os.environ,
+        "HISTORY_DB_PATH": str(scratch_dir / "history.db"),
+        "JOBS_DB_PATH": str(scratch_dir / "jobs.db"),
+        "JOBS_DIR": str(scratch_dir / "jobs"),
+        "SHADOW_DB_PATH": str(scratch_dir / "shadow.db"),
+        # The watcher would otherwise poll final_model.pkl in every worker.
+        "MODEL_RELOAD_INTERVAL_SECONDS": "0",
+        **env_overrides,
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "backend.app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_healthy(base_url, process)
+    except Exception:
+        stop_server(process)
+        raise
+    return process, base_url
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def find_saturation(runs: list[dict]) -> list[dict]:
+    # Per (workers, concurrency): the highest target rate still served at
+    # >= 95% of target with < 1% errors, and the first rate that was not.
+    output = []
+    for (workers, concurrency), group in itertools.groupby(
+        sorted(runs, key=lambda run: (run["workers"], run["concurrency"], run["rate"])),
+        key=lambda run: (run["workers"], run["concurrency"]),
+    ):
+        sustained, saturated_at = None, None
+        for run in group:
+            total = run["summary"]["total"]
+            healthy = (
+                (total["achieved_ratio"] or 0) >= SATURATION_MIN_ACHIEVED
+                and total["error_rate"] < SATURATION_MAX_ERROR_RATE
+            )
+            if healthy and saturated_at is None:
+                sustained = run["rate"]
+            elif not healthy and saturated_at is None:
+                saturated_at = run["rate"]
+        output.append(
+            {"workers": workers, "concurrency": concurrency, "max_sustained_rps": sustained, "saturated_at_rps": saturated_at}
+        )
+    return output
+
+
+def print_run(run: dict) -> None:
+    total = run["summary"]["total"]
+    print(
+        f"\nworkers={run['workers'] or '-'} concurrency={run['concurrency']} target={run['rate']:g} rps"
+        f" -> {total['throughput_rps']:.1f} rps ({total['achieved_ratio']:.0%}), errors {total['error_rate']:.2%}"
+    )
+    print(f"  {'endpoint':<20}{'requests':>9}{'rps':>9}{'err%':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for endpoint, stats in {**run["summary"]["endpoints"], "TOTAL": total}.items():
+        if stats["p50_ms"] is None:
+            continue
+        print(
+            f"  {endpoint:<20}{stats['requests']:>9}{stats['throughput_rps']:>9.1f}{stats['error_rate']:>8.2%}"
+            f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+
+
+def _parse_pairs(values: list[str], cast) -> dict:
+    pairs = {}
+    for value in values:
+        for item in value.split(","):
+            if item:
+                key, _, raw = item.partition("=")
+                pairs[key.strip()] = cast(raw)
+    return pairs
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Drive mixed authenticated traffic at the API and report latency.")
+    parser.add_argument("--url", default=None, help="target a running server instead of starting one")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="uvicorn worker counts to try")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16], help="virtual clients")
+    parser.add_argument("--rate", type=float, nargs="+", default=[20, 50, 100], help="target requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before each run")
+    parser.add_argument("--mix", nargs="*", default=[], help="endpoint weights, e.g. predict=60,history=10")
+    parser.add_argument("--batch-rows", type=int, default=100, help="rows per /api/predict/batch upload")
+    parser.add_argument("--env", nargs="*", default=[], help="server env overrides, e.g. MODEL_BACKEND=compiled")
+    parser.add_argument("--output", default=str(LOADTEST_RESULTS_PATH))
+    args = parser.parse_args()
+
+    mix = {**DEFAULT_MIX, **_parse_pairs(args.mix, float)} if args.mix else dict(DEFAULT_MIX)
+    mix = {name: weight for name, weight in mix.items() if weight > 0}
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"unknown endpoints in --mix: {sorted(unknown)}")
+    env_overrides = _parse_pairs(args.env, str)
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="loadtest-") as tmp_dir:
+        for workers in [None] if args.url else args.workers:
+            process = None
+            base_url = args.url
+            if base_url is None:
+                print(f"\nStarting backend with {workers} worker(s)...")
+                process, base_url = start_server(workers, Path(tmp_dir) / f"workers-{workers}", env_overrides)
+            try:
+                for concurrency, rate in itertools.product(args.concurrency, args.rate):
+                    records = run_load(base_url, rate, concurrency, args.duration, mix, args.warmup, args.batch_rows)
+                    run = {
+                        "workers": workers,
+                        "concurrency": concurrency,
+                        "rate": rate,
+                        "summary": summarize(records, args.duration, rate),
+                    }
+                    runs.append(run)
+                    print_run(run)
+            finally:
+                if process is not None:
+                    stop_server(process)
+
+    saturation = find_saturation(runs)
+    print("\nSaturation (achieved >= 95% of target, errors < 1%):")
+    for row in saturation:
+        print(
+            f"  workers={row['workers'] or '-'} concurrency={row['concurrency']}:"
+            f" sustained {row['max_sustained_rps'] or 'none'} rps, saturated at {row['saturated_at_rps'] or 'not reached'}"
+        )
+
+    output = {
+        "created_at": datetime.utcnow().isoformat(),
+        "settings": {
+            "url": args.url,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "mix": mix,
+            "batch_rows": args.batch_rows,
+            "env": env_overrides,
+            "cpu_count": os.cpu_count(),
+        },
+        "runs": runs,
+        "saturation": saturation,
+    }
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    print("\nSaved load test results to:", output_path)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
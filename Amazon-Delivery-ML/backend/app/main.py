@@ -1,11 +1,50 @@
 from io import StringIO
+from typing import Literal
+import os
+import shutil
+import tempfile
 
-from fastapi import Depends, FastAPI, File, HTTPException, UploadFile
+from fastapi import Depends, FastAPI, File, HTTPException, Query, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 import pandas as pd
 
-from .config import DEMO_PASSWORD, DEMO_USER, MODEL_PATH
-from .database import fetch_history, init_db, insert_history
+from .batch_jobs import (
+    JobLimitError,
+    create_job,
+    get_job,
+    get_job_runner,
+    init_jobs_db,
+    list_jobs,
+    request_cancel,
+    result_path,
+)
+from .batch_scoring import (
+    BATCH_REQUIRED_COLUMNS,
+    first_invalid_row,
+    history_entries,
+    missing_batch_columns,
+    output_rows,
+    rows_to_csv,
+    rows_to_ndjson,
+    score_batch_frame,
+)
+from .config import (
+    BATCH_CHUNK_ROWS,
+    DEMO_PASSWORD,
+    DEMO_USER,
+    MICRO_BATCH_ENABLED,
+    MODEL_PATH,
+    SHADOW_MODEL_PATH,
+)
+from .database import (
+    fetch_history,
+    init_db,
+    insert_history,
+    insert_history_many,
+    start_history_writer,
+    stop_history_writer,
+)
 from .dependencies import get_current_user
 from .insights_service import (
     get_about_model,
@@ -16,9 +55,18 @@ from .insights_service import (
     process_uploaded_dataset,
 )
 from .metrics_service import get_metrics
-from .predictor import load_model, predict
+from .micro_batcher import get_micro_batcher, micro_batch_stats, predict_coalesced
+from .model_registry import get_model_registry
+from .predictor import get_prediction_cache
 from .schemas import LoginRequest, PredictRequest, PredictResponse, TokenResponse
 from .security import create_access_token, verify_password
+from .shadow_scoring import (
+    fetch_shadow_summary,
+    get_shadow_scorer,
+    start_shadow_scorer,
+    stop_shadow_scorer,
+    submit_shadow,
+)
 
 
 app = FastAPI(
@@ -41,8 +89,24 @@ app.add_middleware(
 def startup_event() -> None:
     if not MODEL_PATH.exists():
         raise RuntimeError(f"Model file not found at: {MODEL_PATH}")
-    load_model()
+    get_model_registry().current()
+    get_model_registry().start()
     init_db()
+    start_history_writer()
+    init_jobs_db()
+    get_job_runner().start()
+    start_shadow_scorer()
+    if MICRO_BATCH_ENABLED:
+        get_micro_batcher().start()
+
+
+@app.on_event("shutdown")
+def shutdown_event() -> None:
+    get_model_registry().stop()
+    stop_shadow_scorer()
+    get_micro_batcher().stop()
+    stop_history_writer()
+    get_job_runner().stop()
 
 
 @app.get("/api/health")
@@ -66,14 +130,16 @@ def predict_one(
     payload: PredictRequest,
     username: str = Depends(get_current_user),
 ) -> PredictResponse:
-    result = predict(payload.model_dump())
+    result = predict_coalesced(payload.model_dump())
     insert_history(
         username=username,
         request_payload=payload.model_dump(),
         prediction_label=result["predicted_label"],
         prediction_id=result["predicted_class_id"],
         confidence=result["confidence"],
+        model_version=result["model_version"],
     )
+    submit_shadow("predict", [payload.model_dump()], [result])
     return PredictResponse(**result)
 
 
@@ -89,6 +155,7 @@ def predict_live(
         prediction_label=result["predicted_label"],
         prediction_id=result["predicted_class_id"],
         confidence=result["confidence"],
+        model_version=result["model_version"],
     )
     return result
 
@@ -96,83 +163,210 @@ def predict_live(
 @app.post("/api/predict/batch")
 def predict_batch(
     file: UploadFile = File(...),
+    output_format: Literal["json", "ndjson", "csv"] = "json",
     username: str = Depends(get_current_user),
-) -> dict:
+):
     if not file.filename.lower().endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
 
+    if output_format != "json":
+        return _stream_batch(file, output_format, username)
+
     content = file.file.read().decode("utf-8")
     df = pd.read_csv(StringIO(content))
 
-    required_cols = [
-        "delivery_partner",
-        "package_type",
-        "vehicle_type",
-        "delivery_mode",
-        "region",
-        "weather_condition",
-        "distance_km",
-        "package_weight_kg",
-        "delivery_rating",
-        "delivery_cost",
-    ]
-    missing = [col for col in required_cols if col not in df.columns]
+    missing = missing_batch_columns(df.columns)
     if missing:
         raise HTTPException(status_code=400, detail=f"Missing columns: {missing}")
 
-    output_rows = []
-    for _, row in df.iterrows():
-        raw = {
-            "delivery_partner": str(row["delivery_partner"]).lower().strip(),
-            "package_type": str(row["package_type"]).lower().strip(),
-            "vehicle_type": str(row["vehicle_type"]).lower().strip(),
-            "delivery_mode": str(row["delivery_mode"]).lower().strip(),
-            "region": str(row["region"]).lower().strip(),
-            "weather_condition": str(row["weather_condition"]).lower().strip(),
-            "distance_km": float(row["distance_km"]),
-            "package_weight_kg": float(row["package_weight_kg"]),
-            "delivery_rating": float(row["delivery_rating"]),
-            "delivery_cost": float(row["delivery_cost"]),
-        }
-        validated = PredictRequest(**raw)
-        result = predict(validated.model_dump())
-
-        insert_history(
-            username=username,
-            request_payload=validated.model_dump(),
-            prediction_label=result["predicted_label"],
-            prediction_id=result["predicted_class_id"],
-            confidence=result["confidence"],
-        )
-
-        output_rows.append(
-            {
-                **validated.model_dump(),
-                **result,
-            }
-        )
+    validated_rows, results = score_batch_frame(df)
+    insert_history_many(username, history_entries(validated_rows, results))
+    submit_shadow("batch", validated_rows, results)
+    rows = output_rows(validated_rows, results)
+
+    return {
+        "count": len(rows),
+        "results": rows,
+    }
+
+
+def _stream_batch(file: UploadFile, output_format: str, username: str) -> StreamingResponse:
+    # The upload is closed once the handler returns, so spool it to a file the
+    # response generator owns and deletes when done.
+    with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as spooled:
+        shutil.copyfileobj(file.file, spooled)
+        spooled_path = spooled.name
+
+    try:
+        header = pd.read_csv(spooled_path, nrows=0)
+    except (ValueError, UnicodeDecodeError) as exc:
+        os.remove(spooled_path)
+        raise HTTPException(status_code=400, detail=f"Could not read CSV: {exc}") from exc
+    missing = missing_batch_columns(header.columns)
+    if missing:
+        os.remove(spooled_path)
+        raise HTTPException(status_code=400, detail=f"Missing columns: {missing}")
+
+    # Once the 200 is sent there is no way to report a bad row, so vet the
+    # whole file first (column-wise, much cheaper than the per-row models).
+    try:
+        offset = 0
+        for chunk in pd.read_csv(spooled_path, usecols=BATCH_REQUIRED_COLUMNS, chunksize=BATCH_CHUNK_ROWS):
+            invalid = first_invalid_row(chunk)
+            if invalid is not None:
+                position, column = invalid
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Row {offset + position + 1}: invalid value for {column}",
+                )
+            offset += len(chunk)
+    except HTTPException:
+        os.remove(spooled_path)
+        raise
+    except (ValueError, UnicodeDecodeError) as exc:
+        os.remove(spooled_path)
+        raise HTTPException(status_code=400, detail=f"Could not read CSV: {exc}") from exc
+
+    def generate():
+        try:
+            chunks = pd.read_csv(spooled_path, chunksize=BATCH_CHUNK_ROWS)
+            for index, chunk in enumerate(chunks):
+                validated_rows, results = score_batch_frame(chunk)
+                insert_history_many(username, history_entries(validated_rows, results))
+                submit_shadow("batch", validated_rows, results)
+                rows = output_rows(validated_rows, results)
+                if output_format == "ndjson":
+                    yield rows_to_ndjson(rows)
+                else:
+                    yield rows_to_csv(rows, header=index == 0)
+        finally:
+            os.remove(spooled_path)
+
+    media_type = "application/x-ndjson" if output_format == "ndjson" else "text/csv"
+    return StreamingResponse(generate(), media_type=media_type)
+
+
+@app.post("/api/jobs", status_code=202)
+def submit_job(
+    file: UploadFile = File(...),
+    username: str = Depends(get_current_user),
+) -> dict:
+    if not file.filename.lower().endswith(".csv"):
+        raise HTTPException(status_code=400, detail="Only CSV files are supported")
+    try:
+        job = create_job(username, file.filename, file.file)
+    except JobLimitError as exc:
+        raise HTTPException(status_code=429, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    get_job_runner().wake()
+    return job
+
 
+@app.get("/api/jobs")
+def jobs(limit: int = Query(default=50, ge=1, le=500), username: str = Depends(get_current_user)) -> dict:
+    return {"items": list_jobs(username, limit=limit)}
+
+
+@app.get("/api/jobs/{job_id}")
+def job_status(job_id: str, username: str = Depends(get_current_user)) -> dict:
+    job = get_job(job_id, username)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str, username: str = Depends(get_current_user)) -> dict:
+    job = request_cancel(job_id, username)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}/result")
+def job_result(job_id: str, username: str = Depends(get_current_user)) -> FileResponse:
+    job = get_job(job_id, username)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return FileResponse(result_path(job_id), media_type="text/csv", filename=f"{job_id}_results.csv")
+
+
+@app.get("/api/predict/stats")
+def predict_stats(username: str = Depends(get_current_user)) -> dict:
+    _ = username
     return {
-        "count": len(output_rows),
-        "results": output_rows,
+        "micro_batching": micro_batch_stats(),
+        "prediction_cache": get_prediction_cache().stats(),
     }
 
 
+@app.get("/api/model")
+def model_status(username: str = Depends(get_current_user)) -> dict:
+    _ = username
+    return get_model_registry().status()
+
+
+@app.post("/api/model/reload")
+def model_reload(
+    force: bool = Query(default=False),
+    username: str = Depends(get_current_user),
+) -> dict:
+    # Runs in the threadpool; other requests keep scoring on the current
+    # version until the candidate has loaded and passed validation.
+    _ = username
+    return get_model_registry().reload(force=force)
+
+
+@app.get("/api/shadow")
+def shadow_status(
+    hours: int | None = Query(default=None, ge=1),
+    username: str = Depends(get_current_user),
+) -> dict:
+    _ = username
+    if not SHADOW_MODEL_PATH:
+        return {"enabled": False, "summary": []}
+    return {"enabled": True, **get_shadow_scorer().stats(), "summary": fetch_shadow_summary(hours)}
+
+
 @app.get("/api/metrics")
 def metrics(username: str = Depends(get_current_user)) -> dict:
     return get_metrics()
 
 
 @app.get("/api/history")
-def history(limit: int = 100, username: str = Depends(get_current_user)) -> dict:
-    _ = username
-    return {"items": fetch_history(limit=limit)}
+def history(
+    limit: int = Query(default=100, ge=1, le=1000),
+    before_id: int | None = None,
+    created_from: str | None = None,
+    created_to: str | None = None,
+    prediction_label: str | None = None,
+    include_payload: bool = True,
+    username: str = Depends(get_current_user),
+) -> dict:
+    items = fetch_history(
+        limit=limit,
+        before_id=before_id,
+        username=username,
+        created_from=created_from,
+        created_to=created_to,
+        prediction_label=prediction_label,
+        include_payload=include_payload,
+    )
+    next_before_id = items[-1]["id"] if len(items) == limit else None
+    return {"items": items, "next_before_id": next_before_id}
 
 
 @app.get("/api/dashboard/overview")
-def dashboard_overview(username: str = Depends(get_current_user)) -> dict:
+def dashboard_overview(
+    trend_days: int = Query(default=7, ge=1, le=90),
+    trend_granularity: Literal["day", "hour"] = "day",
+    username: str = Depends(get_current_user),
+) -> dict:
     _ = username
-    return get_dashboard_overview()
+    return get_dashboard_overview(trend_days=trend_days, trend_granularity=trend_granularity)
 
 
 @app.get("/api/analytics")
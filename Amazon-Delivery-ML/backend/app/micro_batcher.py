@@ -0,0 +1,176 @@
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+import queue
+import threading
+import time
+
+from .config import MICRO_BATCH_ENABLED, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_WINDOW_MS
+from .predictor import current_model, get_prediction_cache, predict, predict_rows
+
+
+_STOP = object()
+
+
+class MicroBatcher:
+    # A request whose batch has not been scored by then (worker died or
+    # wedged) takes itself back and is scored inline.
+    RESULT_TIMEOUT_SECONDS = 30.0
+
+    def __init__(self, window_ms: float, max_batch_size: int, score_batch=predict_rows):
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, max_batch_size)
+        self._score_batch = score_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # Held while enqueueing and while stop() closes the queue, so nothing
+        # can be enqueued behind the stop marker.
+        self._submit_lock = threading.Lock()
+        self._accepting = False
+        self._batches = 0
+        self._requests = 0
+        self._largest_batch = 0
+        self._batch_sizes: Counter = Counter()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name="predict-micro-batcher", daemon=True)
+        self._thread.start()
+        with self._submit_lock:
+            self._accepting = True
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        with self._submit_lock:
+            self._accepting = False
+            self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+
+        # Nothing should be left, but never leave a caller waiting forever.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("Micro-batcher stopped before scoring the request"))
+
+    def submit(self, raw_payload: dict) -> dict:
+        with self._submit_lock:
+            accepting = self._accepting and self.running
+            if accepting:
+                future: Future = Future()
+                self._queue.put((raw_payload, future))
+        if not accepting:
+            return self._score_batch([raw_payload])[0]
+
+        try:
+            return future.result(timeout=self.RESULT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            if future.cancel():
+                return self._score_batch([raw_payload])[0]
+            # Picked up just as the wait ran out; the answer is on its way.
+            return future.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "window_ms": self.window_ms,
+                "max_batch_size": self.max_batch_size,
+                "batches": self._batches,
+                "requests": self._requests,
+                "mean_batch_size": round(self._requests / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "batch_size_counts": {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            }
+
+    def _collect(self, first) -> tuple[list, bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.window_ms / 1000
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stopping = self._collect(item)
+            self._score(batch)
+
+        # Anything submitted while we were shutting down still gets an answer.
+        leftovers = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftovers.append(item)
+        for start in range(0, len(leftovers), self.max_batch_size):
+            self._score(leftovers[start:start + self.max_batch_size])
+
+    def _score(self, batch: list) -> None:
+        # Skip requests that timed out and were scored by their caller.
+        batch = [(payload, future) for payload, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        payloads = [payload for payload, _ in batch]
+        try:
+            results = self._score_batch(payloads)
+        except Exception as exc:
+            for _, future in batch:
+                future.set_exception(exc)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+        with self._lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._batch_sizes[len(batch)] += 1
+
+
+@lru_cache
+def get_micro_batcher() -> MicroBatcher:
+    return MicroBatcher(window_ms=MICRO_BATCH_WINDOW_MS, max_batch_size=MICRO_BATCH_MAX_SIZE)
+
+
+def predict_coalesced(raw_payload: dict) -> dict:
+    if not MICRO_BATCH_ENABLED:
+        return predict(raw_payload)
+
+    cache = get_prediction_cache()
+    cache_key = cache.key(raw_payload, current_model().version)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    result = get_micro_batcher().submit(raw_payload)
+    cache.put(cache_key, result)
+    return result
+
+
+def micro_batch_stats() -> dict:
+    return {"enabled": MICRO_BATCH_ENABLED, **get_micro_batcher().stats()}
@@ -0,0 +1,236 @@
+from pathlib import Path
+import argparse
+import copy
+import io
+import json
+import os
+import shutil
+import time
+
+import joblib
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+
+from .compiled_forest import CompiledForest
+from .config import BALANCED_TRAIN_PATH, COMPACTION_REPORT_PATH, MODEL_PATH, TEST_DATA_PATH
+from .predictor import _forest_proba
+from .table_io import read_table, resolve_table
+
+
+TREE_COUNTS = [10, 25, 50, 75]
+LATENCY_ROWS = 200
+THROUGHPUT_REPEATS = 3
+SELECTION_ROWS = 5000
+
+
+def _load_xy(path, feature_columns: list[str], rows: int | None = None):
+    frame = read_table(path, columns=feature_columns + ["Delivery_Status"])
+    if rows is not None and len(frame) > rows:
+        frame = frame.sample(rows, random_state=42)
+    return frame[feature_columns], frame["Delivery_Status"].to_numpy()
+
+
+def subset_forest(model, tree_indices):
+    # A shallow copy that shares the fitted trees: still a regular
+    # RandomForestClassifier, so it pickles and serves like the original.
+    subset = copy.copy(model)
+    subset.estimators_ = [model.estimators_[index] for index in tree_indices]
+    subset.n_estimators = len(subset.estimators_)
+    return subset
+
+
+def rank_trees(model, X, y) -> list[int]:
+    # Tree importance = accuracy of the tree on its own over the selection
+    # rows (training data, never the test set the report is scored on).
+    features = np.asarray(X, dtype=np.float32)
+    scores = [
+        float(np.mean(model.classes_.take(np.argmax(estimator.tree_.predict(features), axis=1)) == y))
+        for estimator in model.estimators_
+    ]
+    return sorted(range(len(scores)), key=lambda index: (-scores[index], index))
+
+
+def build_variants(model, ranking: list[int] | None, tree_counts=TREE_COUNTS) -> list[dict]:
+    n_trees = len(model.estimators_)
+    subsets = [("all", list(range(n_trees)))]
+    for k in sorted(set(count for count in tree_counts if 0 < count < n_trees)):
+        subsets.append((f"first{k}", list(range(k))))
+        if ranking is not None:
+            subsets.append((f"top{k}", sorted(ranking[:k])))
+
+    variants = []
+    for name, tree_indices in subsets:
+        forest = subset_forest(model, tree_indices)
+        # "forest" is what gets exported; "model" is what gets measured.
+        for suffix, backend, precision, measured in [
+            ("", "sklearn", "float64", forest),
+            ("-compiled", "compiled", "float64", CompiledForest(forest)),
+            ("-f32", "compiled", "float32", CompiledForest(forest, dtype="float32")),
+        ]:
+            variants.append(
+                {
+                    "name": f"{name}{suffix}",
+                    "backend": backend,
+                    "precision": precision,
+                    "trees": tree_indices,
+                    "forest": forest,
+                    "model": measured,
+                }
+            )
+    return variants
+
+
+def _serialized_bytes(model) -> int:
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    return buffer.getbuffer().nbytes
+
+
+def _row_latency_ms(model, features: np.ndarray) -> float:
+    # Same call the /api/predict path makes for one encoded row.
+    timings = []
+    for index in range(features.shape[0]):
+        row = features[index:index + 1]
+        started = time.perf_counter()
+        _forest_proba(model, row)
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings) * 1000)
+
+
+def _batch_throughput(model, X) -> tuple[np.ndarray, float]:
+    # Same call predict_many makes for a batch upload; best of a few runs.
+    best = None
+    for _ in range(THROUGHPUT_REPEATS):
+        started = time.perf_counter()
+        probabilities = np.asarray(model.predict_proba(X))
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return probabilities, len(X) / best if best else float("inf")
+
+
+def evaluate_variant(variant: dict, X, y, latency_features: np.ndarray) -> dict:
+    model = variant["model"]
+    batch_input = X if variant["backend"] == "sklearn" else np.asarray(X, dtype=np.float32)
+    probabilities, rows_per_second = _batch_throughput(model, batch_input)
+    predicted = model.classes_.take(np.argmax(probabilities, axis=1))
+    return {
+        "name": variant["name"],
+        "trees": len(variant["trees"]),
+        "backend": variant["backend"],
+        "precision": variant["precision"],
+        "accuracy": round(float(accuracy_score(y, predicted)), 4),
+        "macro_f1": round(float(f1_score(y, predicted, average="macro")), 4),
+        "row_latency_ms": round(_row_latency_ms(model, latency_features), 4),
+        "batch_rows_per_second": round(rows_per_second, 1),
+        "size_bytes": _serialized_bytes(model),
+    }
+
+
+def mark_pareto(results: list[dict]) -> list[dict]:
+    # A variant is on the frontier when no other variant is at least as
+    # accurate and at least as fast per row, and strictly better at one.
+    for result in results:
+        result["pareto"] = not any(
+            other["accuracy"] >= result["accuracy"]
+            and other["row_latency_ms"] <= result["row_latency_ms"]
+            and (other["accuracy"] > result["accuracy"] or other["row_latency_ms"] < result["row_latency_ms"])
+            for other in results
+        )
+    return results
+
+
+def compaction_report(
+    model_path=MODEL_PATH,
+    test_path=TEST_DATA_PATH,
+    selection_path=BALANCED_TRAIN_PATH,
+    tree_counts=TREE_COUNTS,
+) -> tuple[dict, list[dict]]:
+    model = joblib.load(model_path)
+    feature_columns = list(model.feature_names_in_)
+    X, y = _load_xy(test_path, feature_columns)
+    latency_features = np.asarray(X.iloc[:LATENCY_ROWS], dtype=np.float32)
+
+    ranking = None
+    if resolve_table(selection_path).exists():
+        ranking = rank_trees(model, *_load_xy(selection_path, feature_columns, SELECTION_ROWS))
+
+    variants = build_variants(model, ranking, tree_counts)
+    results = mark_pareto([evaluate_variant(variant, X, y, latency_features) for variant in variants])
+    report = {
+        "model_path": str(model_path),
+        "test_path": str(resolve_table(test_path)),
+        "test_rows": int(len(X)),
+        "selection_path": str(resolve_table(selection_path)) if ranking is not None else None,
+        "tree_ranking": ranking,
+        "variants": results,
+    }
+    return report, variants
+
+
+def default_export_path(variant_name: str) -> Path:
+    return MODEL_PATH.with_name(f"{MODEL_PATH.stem}.{variant_name}{MODEL_PATH.suffix}")
+
+
+def export_variant(variant: dict, output_path=None) -> Path:
+    # Always writes the sklearn forest for the chosen trees, so the file is a
+    # drop-in final_model.pkl; compiled variants are served from it with
+    # MODEL_BACKEND=compiled and the matching COMPILED_MODEL_DTYPE. Written then
+    # renamed, so the hot-reload watcher never sees a partial file. An
+    # existing file is copied to <output>.bak first.
+    output_path = Path(output_path or default_export_path(variant["name"]))
+    tmp_path = output_path.with_suffix(f".{os.getpid()}.tmp")
+    joblib.dump(variant["forest"], tmp_path)
+    if output_path.exists():
+        shutil.copy2(output_path, output_path.with_suffix(output_path.suffix + ".bak"))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def print_report(report: dict) -> None:
+    header = f"{'variant':<18}{'trees':>6}{'accuracy':>10}{'macro_f1':>10}{'row_ms':>9}{'rows/s':>11}{'size_kb':>10}  pareto"
+    print(header)
+    print("-" * len(header))
+    for result in sorted(report["variants"], key=lambda item: item["row_latency_ms"]):
+        print(
+            f"{result['name']:<18}{result['trees']:>6}{result['accuracy']:>10.4f}{result['macro_f1']:>10.4f}"
+            f"{result['row_latency_ms']:>9.3f}{result['batch_rows_per_second']:>11.0f}"
+            f"{result['size_bytes'] / 1024:>10.1f}  {'*' if result['pareto'] else ''}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate compacted variants of the production forest.")
+    parser.add_argument("--model", default=str(MODEL_PATH))
+    parser.add_argument("--test-data", default=str(TEST_DATA_PATH))
+    parser.add_argument("--selection-data", default=str(BALANCED_TRAIN_PATH), help="rows used to rank trees")
+    parser.add_argument("--trees", type=int, nargs="+", default=TREE_COUNTS, help="tree counts to try")
+    parser.add_argument("--report", default=str(COMPACTION_REPORT_PATH))
+    parser.add_argument("--export", metavar="VARIANT", help="write this variant as a drop-in model file")
+    parser.add_argument(
+        "--output",
+        help="where --export writes the model (default: final_model.<VARIANT>.pkl; an existing file is kept as .bak)",
+    )
+    args = parser.parse_args()
+
+    report, variants = compaction_report(args.model, args.test_data, args.selection_data, args.trees)
+    if report["tree_ranking"] is None:
+        print(f"{args.selection_data} not found; skipping importance-ranked variants.")
+    print_report(report)
+
+    report_path = Path(args.report)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print("\nSaved compaction report to:", report_path)
+
+    if args.export:
+        chosen = next((variant for variant in variants if variant["name"] == args.export), None)
+        if chosen is None:
+            raise SystemExit(f"Unknown variant {args.export!r}; choose one of: {', '.join(v['name'] for v in variants)}")
+        print(f"Exported {chosen['name']} to:", export_variant(chosen, args.output))
+        if chosen["backend"] == "compiled":
+            print(f"Serve it with MODEL_BACKEND=compiled and COMPILED_MODEL_DTYPE={chosen['precision']}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+import os
+import threading
+
+import joblib
+import numpy as np
+
+from .artifact_cache import check_fingerprints, fingerprint
+from .compiled_forest import load_compiled_forest
+from .config import (
+    ENCODER_PATH,
+    MODEL_BACKEND,
+    MODEL_PATH,
+    MODEL_RELOAD_HOLDOUT_ROWS,
+    MODEL_RELOAD_INTERVAL_SECONDS,
+    MODEL_RELOAD_MIN_ACCURACY,
+    TEST_DATA_PATH,
+)
+from .preprocessing import FeatureEncoder
+from .table_io import read_table, resolve_table
+
+
+class ModelHandle:
+    # One immutable (model, encoder) pair. Requests grab a handle once and
+    # use it throughout, so a swap never mixes versions inside a request.
+    def __init__(self, version: str, model, encoder: FeatureEncoder, inputs: dict):
+        self.version = version
+        self.model = model
+        self.encoder = encoder
+        self.inputs = inputs
+        self.loaded_at = datetime.utcnow().isoformat()
+        # (staged, final) when loading rebuilt the compiled export; see
+        # publish_handle().
+        self.pending_export: tuple[Path, Path] | None = None
+
+
+def handle_versions(handle: ModelHandle) -> dict:
+    # What artifacts derived from the served model are keyed on.
+    return {name: (value or {}).get("sha256") for name, value in handle.inputs.items()}
+
+
+def _load_encoder(model, encoder_path) -> FeatureEncoder:
+    feature_names = getattr(model, "feature_names_in_", None)
+    if Path(encoder_path).exists():
+        encoder = FeatureEncoder.load(encoder_path)
+        if feature_names is not None and encoder.feature_columns != list(feature_names):
+            raise ValueError(f"{encoder_path} does not match the feature columns of the model")
+        return encoder
+    if feature_names is None:
+        raise ValueError(f"{encoder_path} is missing and the model does not record its feature names")
+    return FeatureEncoder.from_feature_columns(feature_names)
+
+
+def _input_paths(model_path, encoder_path) -> dict[str, Path]:
+    return {"model": Path(model_path), "encoder": Path(encoder_path)}
+
+
+def load_handle(model_path=MODEL_PATH, encoder_path=ENCODER_PATH) -> ModelHandle:
+    inputs = {name: fingerprint(path) for name, path in _input_paths(model_path, encoder_path).items()}
+    if inputs["model"] is None:
+        raise FileNotFoundError(f"Model file not found at: {model_path}")
+    pending_export = None
+    if MODEL_BACKEND == "compiled":
+        # A rebuilt export goes to a staging file; the shared one is only
+        # replaced once the handle is accepted.
+        compiled_path = Path(model_path).with_suffix(".compiled.joblib")
+        staged_path = compiled_path.with_name(f"{compiled_path.name}.{os.getpid()}.staged")
+        staged_path.unlink(missing_ok=True)
+        model = load_compiled_forest(model_path, compiled_path, export_path=staged_path)
+        if staged_path.exists():
+            pending_export = (staged_path, compiled_path)
+    else:
+        model = joblib.load(model_path)
+    try:
+        encoder = _load_encoder(model, encoder_path)
+    except Exception:
+        if pending_export is not None:
+            pending_export[0].unlink(missing_ok=True)
+        raise
+    handle = ModelHandle(inputs["model"]["sha256"][:12], model, encoder, inputs)
+    handle.pending_export = pending_export
+    return handle
+
+
+def publish_handle(handle: ModelHandle) -> None:
+    # The mapped arrays stay valid across the rename (same inode).
+    if handle.pending_export is not None:
+        os.replace(*handle.pending_export)
+        handle.pending_export = None
+
+
+def discard_handle(handle: ModelHandle) -> None:
+    if handle.pending_export is not None:
+        handle.pending_export[0].unlink(missing_ok=True)
+        handle.pending_export = None
+
+
+def validate_handle(handle: ModelHandle, holdout_path=TEST_DATA_PATH, rows: int = 500, min_accuracy: float = 0.0) -> dict:
+    # Scoring the holdout also warms the candidate (page-ins, lazy imports)
+    # before it takes traffic.
+    holdout_path = resolve_table(holdout_path)
+    if not holdout_path.exists() or rows <= 0:
+        return {"passed": True, "rows": 0, "accuracy": None, "reason": "no holdout configured"}
+
+    frame = read_table(holdout_path, columns=handle.encoder.feature_columns + ["Delivery_Status"]).head(rows)
+    probabilities = np.asarray(handle.model.predict_proba(frame[handle.encoder.feature_columns]))
+    if probabilities.shape != (len(frame), len(handle.model.classes_)):
+        return {"passed": False, "rows": len(frame), "accuracy": None, "reason": "unexpected probability shape"}
+    if not np.all(np.isfinite(probabilities)) or not np.allclose(probabilities.sum(axis=1), 1.0):
+        return {"passed": False, "rows": len(frame), "accuracy": None, "reason": "probabilities do not sum to 1"}
+
+    predicted = handle.model.classes_.take(np.argmax(probabilities, axis=1))
+    accuracy = float(np.mean(predicted == frame["Delivery_Status"].to_numpy())) if len(frame) else None
+    if accuracy is not None and accuracy < min_accuracy:
+        return {"passed": False, "rows": len(frame), "accuracy": accuracy, "reason": f"accuracy below {min_accuracy}"}
+    return {"passed": True, "rows": len(frame), "accuracy": accuracy, "reason": None}
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        model_path=MODEL_PATH,
+        encoder_path=ENCODER_PATH,
+        check_interval_seconds: float = 0.0,
+        holdout_rows: int = 500,
+        min_accuracy: float = 0.0,
+    ):
+        self.model_path = model_path
+        self.encoder_path = encoder_path
+        self.check_interval_seconds = check_interval_seconds
+        self.holdout_rows = holdout_rows
+        self.min_accuracy = min_accuracy
+        self._handle: ModelHandle | None = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._reloads = 0
+        self._rejected = 0
+        self._rejected_inputs: dict | None = None
+        self._last_check: str | None = None
+        self._last_error: str | None = None
+        self._last_validation: dict | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def current(self) -> ModelHandle:
+        handle = self._handle
+        if handle is None:
+            with self._load_lock:
+                if self._handle is None:
+                    handle = load_handle(self.model_path, self.encoder_path)
+                    publish_handle(handle)
+                    self._handle = handle
+                handle = self._handle
+        return handle
+
+    def reload(self, force: bool = False) -> dict:
+        # Loads and validates a candidate while requests keep using the
+        # current handle; the swap itself is a single reference assignment.
+        current = self.current()
+        paths = _input_paths(self.model_path, self.encoder_path)
+        with self._load_lock:
+            self._last_check = datetime.utcnow().isoformat()
+            current = self._handle or current
+            if not force:
+                unchanged = check_fingerprints(current.inputs, paths)
+                if unchanged is not None:
+                    current.inputs = unchanged
+                    return {"reloaded": False, "reason": "unchanged", **self.status()}
+                if self._rejected_inputs is not None and check_fingerprints(self._rejected_inputs, paths) is not None:
+                    return {"reloaded": False, "reason": "candidate already rejected", **self.status()}
+
+            candidate = None
+            try:
+                candidate = load_handle(self.model_path, self.encoder_path)
+                validation = validate_handle(candidate, rows=self.holdout_rows, min_accuracy=self.min_accuracy)
+            except Exception as exc:
+                if candidate is not None:
+                    discard_handle(candidate)
+                self._reject({name: fingerprint(path) for name, path in paths.items()}, f"{type(exc).__name__}: {exc}")
+                return {"reloaded": False, "reason": self._last_error, **self.status()}
+
+            self._last_validation = validation
+            if not validation["passed"]:
+                discard_handle(candidate)
+                self._reject(candidate.inputs, validation["reason"])
+                return {"reloaded": False, "reason": validation["reason"], **self.status()}
+
+            publish_handle(candidate)
+            self._handle = candidate
+            self._reloads += 1
+            self._rejected_inputs = None
+            self._last_error = None
+            return {"reloaded": True, "previous_version": current.version, **self.status()}
+
+    def _reject(self, inputs: dict, reason: str) -> None:
+        self._rejected += 1
+        self._rejected_inputs = inputs
+        self._last_error = reason
+
+    def start(self) -> None:
+        if self.running or self.check_interval_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-reloader", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.check_interval_seconds):
+            try:
+                self.reload()
+            except Exception as exc:
+                self._last_error = f"{type(exc).__name__}: {exc}"
+
+    def status(self) -> dict:
+        handle = self._handle
+        return {
+            "version": handle.version if handle else None,
+            "loaded_at": handle.loaded_at if handle else None,
+            "backend": MODEL_BACKEND,
+            "watching": self.running,
+            "check_interval_seconds": self.check_interval_seconds,
+            "reloads": self._reloads,
+            "rejected": self._rejected,
+            "last_check": self._last_check,
+            "last_error": self._last_error,
+            "last_validation": self._last_validation,
+        }
+
+
+@lru_cache
+def get_model_registry() -> ModelRegistry:
+    return ModelRegistry(
+        check_interval_seconds=MODEL_RELOAD_INTERVAL_SECONDS,
+        holdout_rows=MODEL_RELOAD_HOLDOUT_ROWS,
+        min_accuracy=MODEL_RELOAD_MIN_ACCURACY,
+    )
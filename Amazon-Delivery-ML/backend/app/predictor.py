@@ -1,22 +1,28 @@
+from collections import OrderedDict
 from functools import lru_cache
-import joblib
+import threading
 
-from .config import MODEL_PATH, CLASS_MAP
-from .preprocessing import build_feature_frame
+import numpy as np
+import pandas as pd
 
+from .compiled_forest import CompiledForest
+from .config import CLASS_MAP, PREDICTION_CACHE_ROUND_DIGITS, PREDICTION_CACHE_SIZE
+from .model_registry import ModelHandle, get_model_registry
+from .schemas import PredictRequest
 
-@lru_cache
-def load_model():
-    return joblib.load(MODEL_PATH)
 
+_row_buffers = threading.local()
 
-def predict(raw_payload: dict) -> dict:
-    model = load_model()
-    feature_frame = build_feature_frame(raw_payload)
 
-    predicted = int(model.predict(feature_frame)[0])
-    probabilities_array = model.predict_proba(feature_frame)[0]
+def current_model() -> ModelHandle:
+    return get_model_registry().current()
+
+
+def load_model():
+    return current_model().model
 
+
+def _format_result(predicted: int, probabilities_array, model_version: str) -> dict:
     probabilities = {
         CLASS_MAP[index]: float(probabilities_array[index])
         for index in range(len(probabilities_array))
@@ -28,4 +34,185 @@ def predict(raw_payload: dict) -> dict:
         "predicted_label": CLASS_MAP[predicted],
         "confidence": confidence,
         "probabilities": probabilities,
+        "model_version": model_version,
     }
+
+
+def _feature_row(n_features: int) -> np.ndarray:
+    row = getattr(_row_buffers, "row", None)
+    if row is None or row.shape[1] != n_features:
+        row = np.zeros((1, n_features), dtype=np.float32)
+        _row_buffers.row = row
+    return row
+
+
+def encode_frame(handle: ModelHandle, frame: pd.DataFrame):
+    # Feature matrix for large batches scored through the estimator itself;
+    # named columns keep sklearn's feature-name check quiet.
+    features = handle.encoder.transform(frame, np.float32)
+    feature_names = getattr(handle.model, "feature_names_in_", None)
+    if feature_names is None:
+        return features
+    return pd.DataFrame(features, columns=feature_names, copy=False)
+
+
+def _forest_proba(model, features: np.ndarray) -> np.ndarray:
+    if isinstance(model, CompiledForest):
+        return model.predict_proba(features)
+
+    # Same accumulation as RandomForestClassifier.predict_proba, minus the
+    # per-call input validation and joblib dispatch that dominate one-row calls.
+    n_classes = len(model.classes_)
+    probabilities = np.zeros((features.shape[0], n_classes), dtype=np.float64)
+    for estimator in model.estimators_:
+        tree_proba = estimator.tree_.predict(features)[:, :n_classes]
+        normalizer = tree_proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        probabilities += tree_proba / normalizer
+    probabilities /= len(model.estimators_)
+    return probabilities
+
+
+class PredictionCache:
+    def __init__(self, max_entries: int, round_digits: int | None = None):
+        self.max_entries = max(0, max_entries)
+        self.round_digits = round_digits
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_version: str | None = None
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _check_version(self, version: str) -> None:
+        # Keys lead with the model version; the first lookup under a new
+        # version drops everything cached for the old one.
+        if version == self._model_version:
+            return
+        if self._model_version is not None and self._entries:
+            self._entries.clear()
+            self._invalidations += 1
+        self._model_version = version
+
+    def key(self, raw_payload: dict, model_version: str) -> tuple | None:
+        if not self.enabled:
+            return None
+        parts = [model_version]
+        for field in PredictRequest.model_fields:
+            value = raw_payload[field]
+            if isinstance(value, (int, float)):
+                value = float(value)
+                if self.round_digits is not None:
+                    value = round(value, self.round_digits)
+            parts.append(value)
+        return tuple(parts)
+
+    def get(self, key: tuple | None) -> dict | None:
+        if key is None:
+            return None
+        with self._lock:
+            self._check_version(key[0])
+            result = self._entries.get(key)
+            if result is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return {**result, "probabilities": dict(result["probabilities"])}
+
+    def put(self, key: tuple | None, result: dict) -> None:
+        # A request that started before a swap may finish on the old model;
+        # only cache results that match the version in the key.
+        if key is None or result.get("model_version") != key[0]:
+            return
+        with self._lock:
+            if key[0] != self._model_version:
+                return
+            self._entries[key] = {**result, "probabilities": dict(result["probabilities"])}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "round_digits": self.round_digits,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+@lru_cache
+def get_prediction_cache() -> PredictionCache:
+    return PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_ROUND_DIGITS)
+
+
+def _predict_uncached(raw_payload: dict, handle: ModelHandle | None = None) -> dict:
+    handle = handle or current_model()
+    features = _feature_row(handle.encoder.n_features)
+    handle.encoder.transform_row(raw_payload, features[0])
+
+    probabilities_array = _forest_proba(handle.model, features)[0]
+    predicted = int(handle.model.classes_[np.argmax(probabilities_array)])
+
+    return _format_result(predicted, probabilities_array, handle.version)
+
+
+def predict(raw_payload: dict) -> dict:
+    handle = current_model()
+    cache = get_prediction_cache()
+    cache_key = cache.key(raw_payload, handle.version)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    result = _predict_uncached(raw_payload, handle)
+    cache.put(cache_key, result)
+    return result
+
+
+def predict_rows(raw_payloads: list[dict]) -> list[dict]:
+    if not raw_payloads:
+        return []
+
+    handle = current_model()
+    features = handle.encoder.transform_records(raw_payloads, np.float32)
+
+    probabilities_matrix = _forest_proba(handle.model, features)
+    predicted = handle.model.classes_.take(np.argmax(probabilities_matrix, axis=1))
+
+    return [
+        _format_result(int(class_id), probabilities_array, handle.version)
+        for class_id, probabilities_array in zip(predicted, probabilities_matrix)
+    ]
+
+
+def predict_many(frame: pd.DataFrame) -> list[dict]:
+    if frame.empty:
+        return []
+
+    handle = current_model()
+    probabilities_matrix = handle.model.predict_proba(encode_frame(handle, frame))
+    predicted = handle.model.classes_.take(np.argmax(probabilities_matrix, axis=1))
+
+    return [
+        _format_result(int(class_id), probabilities_array, handle.version)
+        for class_id, probabilities_array in zip(predicted, probabilities_matrix)
+    ]
@@ -1,12 +1,19 @@
+from pathlib import Path
+import json
+import math
+
 import numpy as np
 import pandas as pd
 
 
-FEATURE_COLUMNS = [
+RAW_NUMERIC_COLUMNS = [
     "distance_km",
     "package_weight_kg",
     "delivery_rating",
     "delivery_cost",
+]
+
+ENGINEERED_COLUMNS = [
     "Traffic_Index",
     "Complexity_Score",
     "Distance_Weight",
@@ -15,138 +22,187 @@ FEATURE_COLUMNS = [
     "Log_Distance",
     "Log_Weight",
     "Log_Cost",
-    "delivery_partner_blue dart",
-    "delivery_partner_delhivery",
-    "delivery_partner_dhl",
-    "delivery_partner_ecom express",
-    "delivery_partner_ekart",
-    "delivery_partner_fedex",
-    "delivery_partner_shadowfax",
-    "delivery_partner_xpressbees",
-    "package_type_clothing",
-    "package_type_cosmetics",
-    "package_type_documents",
-    "package_type_electronics",
-    "package_type_fragile items",
-    "package_type_furniture",
-    "package_type_groceries",
-    "package_type_pharmacy",
-    "vehicle_type_ev bike",
-    "vehicle_type_ev van",
-    "vehicle_type_scooter",
-    "vehicle_type_truck",
-    "vehicle_type_van",
-    "delivery_mode_same day",
-    "delivery_mode_standard",
-    "delivery_mode_two day",
-    "region_east",
-    "region_north",
-    "region_south",
-    "region_west",
-    "weather_condition_cold",
-    "weather_condition_foggy",
-    "weather_condition_hot",
-    "weather_condition_rainy",
-    "weather_condition_stormy",
 ]
 
+CATEGORICAL_FIELDS = [
+    "delivery_partner",
+    "package_type",
+    "vehicle_type",
+    "delivery_mode",
+    "region",
+    "weather_condition",
+]
 
-def _traffic_index(payload: dict) -> int:
-    traffic = 0
-    if payload["weather_condition"] in ["stormy", "foggy", "rainy"]:
-        traffic += 2
-    if payload["delivery_mode"] == "same day":
-        traffic += 2
-    if payload["region"] in ["central", "west"]:
-        traffic += 1
-    return traffic
+NUMERIC_COLUMNS = RAW_NUMERIC_COLUMNS + ENGINEERED_COLUMNS
 
+TRAFFIC_WEATHER = ["stormy", "foggy", "rainy"]
+TRAFFIC_MODES = ["same day"]
+TRAFFIC_REGIONS = ["central", "west"]
 
-def _with_engineered_features(payload: dict) -> dict:
-    distance_km = payload["distance_km"]
-    package_weight_kg = payload["package_weight_kg"]
-    delivery_cost = payload["delivery_cost"]
 
-    payload["Traffic_Index"] = _traffic_index(payload)
-    payload["Complexity_Score"] = (
-        distance_km * 0.4 + package_weight_kg * 0.3 + delivery_cost * 0.3
+def _numeric_features(distance_km, package_weight_kg, delivery_rating, delivery_cost, traffic_index, log1p) -> tuple:
+    # Shared by the vectorized and scalar paths: arrays or floats in, the
+    # values of NUMERIC_COLUMNS out, in that order.
+    return (
+        distance_km,
+        package_weight_kg,
+        delivery_rating,
+        delivery_cost,
+        traffic_index,
+        distance_km * 0.4 + package_weight_kg * 0.3 + delivery_cost * 0.3,
+        distance_km * package_weight_kg,
+        delivery_cost / (distance_km + 1),
+        delivery_cost / (package_weight_kg + 1),
+        log1p(distance_km),
+        log1p(package_weight_kg),
+        log1p(delivery_cost),
     )
-    payload["Distance_Weight"] = distance_km * package_weight_kg
-    payload["Cost_per_KM"] = delivery_cost / (distance_km + 1)
-    payload["Cost_per_Weight"] = delivery_cost / (package_weight_kg + 1)
-    payload["Log_Distance"] = float(np.log1p(distance_km))
-    payload["Log_Weight"] = float(np.log1p(package_weight_kg))
-    payload["Log_Cost"] = float(np.log1p(delivery_cost))
-    return payload
-
-
-def build_feature_frame(raw_payload: dict) -> pd.DataFrame:
-    payload = _with_engineered_features(dict(raw_payload))
-    row = {feature: 0 for feature in FEATURE_COLUMNS}
-
-    for num_col in [
-        "distance_km",
-        "package_weight_kg",
-        "delivery_rating",
-        "delivery_cost",
-        "Traffic_Index",
-        "Complexity_Score",
-        "Distance_Weight",
-        "Cost_per_KM",
-        "Cost_per_Weight",
-        "Log_Distance",
-        "Log_Weight",
-        "Log_Cost",
-    ]:
-        row[num_col] = payload[num_col]
-
-    category_to_col = {
-        "delivery_partner": [
-            "delivery_partner_blue dart",
-            "delivery_partner_delhivery",
-            "delivery_partner_dhl",
-            "delivery_partner_ecom express",
-            "delivery_partner_ekart",
-            "delivery_partner_fedex",
-            "delivery_partner_shadowfax",
-            "delivery_partner_xpressbees",
-        ],
-        "package_type": [
-            "package_type_clothing",
-            "package_type_cosmetics",
-            "package_type_documents",
-            "package_type_electronics",
-            "package_type_fragile items",
-            "package_type_furniture",
-            "package_type_groceries",
-            "package_type_pharmacy",
-        ],
-        "vehicle_type": [
-            "vehicle_type_ev bike",
-            "vehicle_type_ev van",
-            "vehicle_type_scooter",
-            "vehicle_type_truck",
-            "vehicle_type_van",
-        ],
-        "delivery_mode": [
-            "delivery_mode_same day",
-            "delivery_mode_standard",
-            "delivery_mode_two day",
-        ],
-        "region": ["region_east", "region_north", "region_south", "region_west"],
-        "weather_condition": [
-            "weather_condition_cold",
-            "weather_condition_foggy",
-            "weather_condition_hot",
-            "weather_condition_rainy",
-            "weather_condition_stormy",
-        ],
-    }
-
-    for field, columns in category_to_col.items():
-        selected = f"{field}_{payload[field]}"
-        if selected in columns:
-            row[selected] = 1
-
-    frame = pd.DataFrame([row], columns=FEATURE_COLUMNS)
-    return frame
+
+
+class FeatureEncoder:
+    # Fitted on the cleaned dataset by feature_engineering.py and saved next
+    # to the model; the backend scores with the same object, so training and
+    # serving share one definition of every engineered and one-hot column.
+    # Every output position is looked up by column name, so feature_columns
+    # may come in any order (e.g. a model's feature_names_in_).
+    def __init__(self, categories: dict[str, list[str]], feature_columns: list[str] | None = None):
+        self.categories = {field: list(categories[field]) for field in CATEGORICAL_FIELDS}
+        expected = NUMERIC_COLUMNS + [
+            f"{field}_{value}" for field in CATEGORICAL_FIELDS for value in self.categories[field]
+        ]
+        if feature_columns is None:
+            feature_columns = expected
+        elif sorted(feature_columns) != sorted(expected):
+            raise ValueError("Feature columns do not match the encoder layout")
+        self.feature_columns = list(feature_columns)
+        self.feature_index = {column: index for index, column in enumerate(self.feature_columns)}
+        self._numeric_positions = [self.feature_index[column] for column in NUMERIC_COLUMNS]
+        self._category_index = {
+            field: {value: self.feature_index[f"{field}_{value}"] for value in values}
+            for field, values in self.categories.items()
+        }
+        self._category_positions = {
+            field: np.array(list(value_to_index.values()), dtype=np.intp)
+            for field, value_to_index in self._category_index.items()
+        }
+        self._category_lookup = {field: pd.Index(values) for field, values in self.categories.items()}
+
+    @property
+    def n_features(self) -> int:
+        return len(self.feature_columns)
+
+    @classmethod
+    def fit(cls, frame: pd.DataFrame) -> "FeatureEncoder":
+        # Same levels as pd.get_dummies(..., drop_first=True): sorted, minus
+        # the first, which becomes the all-zero baseline.
+        return cls(
+            {field: sorted(frame[field].dropna().astype(str).unique())[1:] for field in CATEGORICAL_FIELDS}
+        )
+
+    @classmethod
+    def from_feature_columns(cls, columns) -> "FeatureEncoder":
+        columns = list(columns)
+        categories = {field: [] for field in CATEGORICAL_FIELDS}
+        for column in columns:
+            if column in NUMERIC_COLUMNS:
+                continue
+            field = next((name for name in CATEGORICAL_FIELDS if column.startswith(f"{name}_")), None)
+            if field is None:
+                raise ValueError(f"Unrecognised feature column: {column}")
+            categories[field].append(column[len(field) + 1:])
+        return cls(categories, columns)
+
+    @classmethod
+    def load(cls, path) -> "FeatureEncoder":
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return cls(state["categories"], state.get("feature_columns"))
+
+    def save(self, path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"categories": self.categories, "feature_columns": self.feature_columns}, f, indent=2)
+        return path
+
+    def transform(self, data, dtype=np.float64, out: np.ndarray | None = None) -> np.ndarray:
+        # data is a DataFrame or any mapping of column name -> equal-length
+        # sequence of raw values.
+        distance_km = np.asarray(data["distance_km"], dtype=np.float64)
+        rows = len(distance_km)
+
+        if out is None:
+            out = np.zeros((rows, self.n_features), dtype=dtype)
+        else:
+            out.fill(0)
+
+        traffic_index = (
+            np.isin(np.asarray(data["weather_condition"], dtype=object), TRAFFIC_WEATHER) * 2
+            + np.isin(np.asarray(data["delivery_mode"], dtype=object), TRAFFIC_MODES) * 2
+            + np.isin(np.asarray(data["region"], dtype=object), TRAFFIC_REGIONS) * 1
+        )
+        values = _numeric_features(
+            distance_km,
+            np.asarray(data["package_weight_kg"], dtype=np.float64),
+            np.asarray(data["delivery_rating"], dtype=np.float64),
+            np.asarray(data["delivery_cost"], dtype=np.float64),
+            traffic_index,
+            np.log1p,
+        )
+        for index, value in zip(self._numeric_positions, values):
+            out[:, index] = value
+
+        row_ids = np.arange(rows)
+        for field in CATEGORICAL_FIELDS:
+            codes = self._category_lookup[field].get_indexer(np.asarray(data[field], dtype=object))
+            known = codes >= 0
+            out[row_ids[known], self._category_positions[field][codes[known]]] = 1
+        return out
+
+    def transform_row(self, payload: dict, out: np.ndarray) -> np.ndarray:
+        # Scalar form of transform() for one request; avoids numpy call
+        # overhead that dominates at a single row.
+        out.fill(0)
+        traffic_index = (
+            (2 if payload["weather_condition"] in TRAFFIC_WEATHER else 0)
+            + (2 if payload["delivery_mode"] in TRAFFIC_MODES else 0)
+            + (1 if payload["region"] in TRAFFIC_REGIONS else 0)
+        )
+        values = _numeric_features(
+            float(payload["distance_km"]),
+            float(payload["package_weight_kg"]),
+            float(payload["delivery_rating"]),
+            float(payload["delivery_cost"]),
+            traffic_index,
+            math.log1p,
+        )
+        for index, value in zip(self._numeric_positions, values):
+            out[index] = value
+
+        for field, value_to_index in self._category_index.items():
+            index = value_to_index.get(payload[field])
+            if index is not None:
+                out[index] = 1
+        return out
+
+    def transform_records(self, records: list[dict], dtype=np.float64) -> np.ndarray:
+        # Request dicts arrive in small groups (micro-batches), where the
+        # scalar path beats building columns for transform().
+        out = np.zeros((len(records), self.n_features), dtype=dtype)
+        for row, record in zip(out, records):
+            self.transform_row(record, row)
+        return out
+
+    def transform_frame(self, frame: pd.DataFrame) -> pd.DataFrame:
+        # DataFrame form used for the training tables: same dtypes as the
+        # original get_dummies output (raw columns untouched, int traffic
+        # index, bool one-hots).
+        matrix = self.transform(frame)
+        columns = {column: matrix[:, index] for column, index in zip(NUMERIC_COLUMNS, self._numeric_positions)}
+        for column in RAW_NUMERIC_COLUMNS:
+            columns[column] = frame[column].to_numpy()
+        columns["Traffic_Index"] = columns["Traffic_Index"].astype(np.int64)
+        for column, index in self.feature_index.items():
+            if column not in columns:
+                columns[column] = matrix[:, index].astype(bool)
+        return pd.DataFrame(columns, columns=self.feature_columns, index=frame.index)
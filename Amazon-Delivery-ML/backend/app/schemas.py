@@ -60,3 +60,4 @@ class PredictResponse(BaseModel):
     predicted_label: str
     confidence: float
     probabilities: dict[str, float]
+    model_version: str
@@ -0,0 +1,285 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+import json
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .config import (
+    CLASS_MAP,
+    MODEL_RELOAD_INTERVAL_SECONDS,
+    SHADOW_DB_PATH,
+    SHADOW_ENCODER_PATH,
+    SHADOW_MODEL_PATH,
+    SHADOW_QUEUE_SIZE,
+)
+from .model_registry import ModelRegistry
+from .predictor import encode_frame
+from .preprocessing import CATEGORICAL_FIELDS, RAW_NUMERIC_COLUMNS
+
+
+SHADOW_INPUT_COLUMNS = CATEGORICAL_FIELDS + RAW_NUMERIC_COLUMNS
+
+_STOP = object()
+
+
+def _get_conn() -> sqlite3.Connection:
+    Path(SHADOW_DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(SHADOW_DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_shadow_db() -> None:
+    conn = _get_conn()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS shadow_comparisons (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            source TEXT NOT NULL,
+            primary_version TEXT,
+            shadow_version TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            agreed INTEGER NOT NULL,
+            prob_delta_sum REAL NOT NULL,
+            prob_delta_max REAL NOT NULL,
+            disagreements TEXT NOT NULL
+        )
+        """
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_shadow_created_at ON shadow_comparisons (created_at)"
+    )
+    conn.commit()
+    conn.close()
+
+
+def compare(primary_results: list[dict], shadow_probabilities: np.ndarray, shadow_classes) -> dict:
+    primary_probabilities = np.array(
+        [[result["probabilities"][label] for label in CLASS_MAP.values()] for result in primary_results]
+    )
+    primary_ids = np.array([result["predicted_class_id"] for result in primary_results])
+    shadow_ids = np.asarray(shadow_classes).take(np.argmax(shadow_probabilities, axis=1))
+
+    # Per row: the largest absolute difference across the class probabilities.
+    deltas = np.max(np.abs(primary_probabilities - shadow_probabilities), axis=1)
+    disagreements = Counter(
+        f"{CLASS_MAP[int(primary)]}->{CLASS_MAP[int(shadow)]}"
+        for primary, shadow in zip(primary_ids, shadow_ids)
+        if primary != shadow
+    )
+    return {
+        "row_count": int(len(primary_ids)),
+        "agreed": int(np.sum(primary_ids == shadow_ids)),
+        "prob_delta_sum": float(deltas.sum()),
+        "prob_delta_max": float(deltas.max()) if len(deltas) else 0.0,
+        "disagreements": dict(disagreements),
+    }
+
+
+class ShadowScorer:
+    def __init__(self, registry: ModelRegistry, max_queue: int, check_interval_seconds: float = 0.0):
+        self.registry = registry
+        self.check_interval_seconds = check_interval_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_queue))
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self._submitted = 0
+        self._dropped = 0
+        self._scored_rows = 0
+        self._errors = 0
+        self._last_error: str | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.registry.current()
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        # Pending comparisons are discarded (and counted as dropped); only
+        # the stop marker has to fit.
+        discarded = 0
+        while True:
+            try:
+                self._queue.put_nowait(_STOP)
+                break
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    discarded += 1
+                except queue.Empty:
+                    pass
+        self._thread.join()
+        self._thread = None
+        # Submissions that raced in behind the stop marker were never scored.
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                discarded += 1
+        with self._lock:
+            self._dropped += discarded
+
+    def submit(self, source: str, rows, primary_results: list[dict]) -> bool:
+        # Called on the request path: never blocks, sheds load when full.
+        if not self.running or not primary_results:
+            return False
+        try:
+            self._queue.put_nowait((source, rows, primary_results))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+        with self._lock:
+            self._submitted += 1
+        return True
+
+    def stats(self) -> dict:
+        shadow_version = self.registry.status()["version"]
+        with self._lock:
+            return {
+                "running": self.running,
+                "shadow_version": shadow_version,
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "submitted": self._submitted,
+                "dropped": self._dropped,
+                "scored_rows": self._scored_rows,
+                "errors": self._errors,
+                "last_error": self._last_error,
+            }
+
+    def _score(self, conn: sqlite3.Connection, source: str, rows, primary_results: list[dict]) -> None:
+        now = time.monotonic()
+        if self.check_interval_seconds > 0 and now >= self._next_check:
+            self._next_check = now + self.check_interval_seconds
+            self.registry.reload()
+
+        handle = self.registry.current()
+        frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=SHADOW_INPUT_COLUMNS)
+        probabilities = np.asarray(handle.model.predict_proba(encode_frame(handle, frame)))
+        result = compare(primary_results, probabilities, handle.model.classes_)
+
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO shadow_comparisons
+                (created_at, source, primary_version, shadow_version, row_count, agreed,
+                 prob_delta_sum, prob_delta_max, disagreements)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    datetime.utcnow().isoformat(),
+                    source,
+                    primary_results[0].get("model_version"),
+                    handle.version,
+                    result["row_count"],
+                    result["agreed"],
+                    result["prob_delta_sum"],
+                    result["prob_delta_max"],
+                    json.dumps(result["disagreements"]),
+                ),
+            )
+        with self._lock:
+            self._scored_rows += result["row_count"]
+
+    def _run(self) -> None:
+        conn = _get_conn()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                try:
+                    self._score(conn, *item)
+                except Exception as exc:
+                    with self._lock:
+                        self._errors += 1
+                        self._last_error = f"{type(exc).__name__}: {exc}"
+        finally:
+            conn.close()
+
+
+@lru_cache
+def get_shadow_scorer() -> ShadowScorer:
+    registry = ModelRegistry(SHADOW_MODEL_PATH, SHADOW_ENCODER_PATH, holdout_rows=0)
+    return ShadowScorer(registry, SHADOW_QUEUE_SIZE, MODEL_RELOAD_INTERVAL_SECONDS)
+
+
+def start_shadow_scorer() -> None:
+    if SHADOW_MODEL_PATH:
+        init_shadow_db()
+        get_shadow_scorer().start()
+
+
+def stop_shadow_scorer() -> None:
+    if SHADOW_MODEL_PATH:
+        get_shadow_scorer().stop()
+
+
+def submit_shadow(source: str, rows, primary_results: list[dict]) -> None:
+    if SHADOW_MODEL_PATH:
+        get_shadow_scorer().submit(source, rows, primary_results)
+
+
+def fetch_shadow_summary(hours: int | None = None) -> list[dict]:
+    conditions = ""
+    params: list = []
+    if hours is not None:
+        conditions = "WHERE created_at >= ?"
+        params.append((datetime.utcnow() - timedelta(hours=hours)).isoformat())
+
+    conn = _get_conn()
+    rows = conn.execute(
+        f"""
+        SELECT source, primary_version, shadow_version,
+               SUM(row_count) AS row_count, SUM(agreed) AS agreed,
+               SUM(prob_delta_sum) AS prob_delta_sum, MAX(prob_delta_max) AS prob_delta_max,
+               GROUP_CONCAT(disagreements, '\n') AS disagreements
+        FROM shadow_comparisons
+        {conditions}
+        GROUP BY source, primary_version, shadow_version
+        ORDER BY source, primary_version, shadow_version
+        """,
+        params,
+    ).fetchall()
+    conn.close()
+
+    output = []
+    for row in rows:
+        disagreements = Counter()
+        for chunk in (row["disagreements"] or "").split("\n"):
+            if chunk:
+                disagreements.update(json.loads(chunk))
+        output.append(
+            {
+                "source": row["source"],
+                "primary_version": row["primary_version"],
+                "shadow_version": row["shadow_version"],
+                "rows": row["row_count"],
+                "agreement_rate": round(row["agreed"] / row["row_count"], 4) if row["row_count"] else None,
+                "mean_prob_delta": round(row["prob_delta_sum"] / row["row_count"], 6) if row["row_count"] else None,
+                "max_prob_delta": row["prob_delta_max"],
+                "disagreements": dict(disagreements.most_common()),
+            }
+        )
+    return output
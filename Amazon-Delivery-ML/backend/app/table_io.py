@@ -0,0 +1,109 @@
+from importlib.util import find_spec
+from pathlib import Path
+import os
+
+import pandas as pd
+
+
+PARQUET_COMPRESSION = "zstd"
+
+
+def parquet_available() -> bool:
+    return find_spec("pyarrow") is not None
+
+
+def resolve_table(path) -> Path:
+    # The newer of the .parquet (when pyarrow can read it) and .csv siblings,
+    # so regenerating only one of them is never silently ignored; Parquet
+    # wins a tie.
+    path = Path(path)
+    candidates = [path.with_suffix(".parquet")] if parquet_available() else []
+    candidates = [candidate for candidate in candidates + [path.with_suffix(".csv")] if candidate.exists()]
+    if not candidates:
+        return path
+    return max(candidates, key=lambda candidate: candidate.stat().st_mtime_ns)
+
+
+def table_columns(path) -> list[str]:
+    path = resolve_table(path)
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        return list(pq.read_schema(path).names)
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_table(path, columns: list[str] | None = None) -> pd.DataFrame:
+    path = resolve_table(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path, columns=columns)
+    df = pd.read_csv(path, usecols=columns)
+    # usecols keeps file order; callers index positionally by `columns`.
+    return df[list(columns)] if columns is not None else df
+
+
+def write_table(df: pd.DataFrame, path) -> Path:
+    path = Path(path)
+    if path.suffix == ".parquet":
+        if parquet_available():
+            df.to_parquet(path, index=False, compression=PARQUET_COMPRESSION)
+            return path
+        path = path.with_suffix(".csv")
+        print("pyarrow not installed, writing CSV instead:", path)
+    df.to_csv(path, index=False)
+    return path
+
+
+class TableWriter:
+    # Appends DataFrame chunks to one table without holding them all: Parquet
+    # row groups through pyarrow's ParquetWriter, or CSV appends without it.
+    # Every chunk is cast to the schema of the first one. Chunks go to a
+    # temporary file that replaces `path` only when the writer is closed
+    # without an exception, so a failed run never leaves a truncated table.
+    def __init__(self, path):
+        path = Path(path)
+        if path.suffix == ".parquet" and not parquet_available():
+            path = path.with_suffix(".csv")
+            print("pyarrow not installed, writing CSV instead:", path)
+        self.path = path
+        self.rows = 0
+        self._tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        self._writer = None
+        self._schema = None
+
+    def write(self, chunk: pd.DataFrame) -> None:
+        if self.path.suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self._tmp_path, self._schema, compression=PARQUET_COMPRESSION)
+            self._writer.write_table(table)
+        else:
+            chunk.to_csv(self._tmp_path, index=False, mode="a" if self.rows else "w", header=not self.rows)
+        self.rows += len(chunk)
+
+    def close(self) -> Path:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._tmp_path.exists():
+            os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def discard(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._tmp_path.unlink(missing_ok=True)
+
+    def __enter__(self) -> "TableWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
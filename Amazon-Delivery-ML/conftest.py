@@ -0,0 +1,3 @@
+# pytest.ini sets pythonpath when pytest finds it; this covers runs started
+# above this directory (e.g. a bare `pytest` at the repository root), where
+# pytest puts a rootdir conftest's directory on sys.path instead.
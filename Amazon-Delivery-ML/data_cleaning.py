@@ -1,13 +1,15 @@
 import pandas as pd
 
+from backend.app.table_io import read_table, write_table
+
 
 def clean_data(input_path, output_path):
 
     print("Loading dataset...")
 
     # Auto detect file type
-    if input_path.endswith(".csv"):
-        df = pd.read_csv(input_path)
+    if input_path.endswith((".csv", ".parquet")):
+        df = read_table(input_path)
     elif input_path.endswith(".xlsx"):
         df = pd.read_excel(input_path)
     else:
@@ -53,9 +55,9 @@ def clean_data(input_path, output_path):
 
     print("After Cleaning Shape:", df.shape)
 
-    df.to_csv(output_path, index=False)
-    print("Clean dataset saved successfully.")
+    output_path = write_table(df, output_path)
+    print("Clean dataset saved successfully:", output_path)
 
 
 if __name__ == "__main__":
-    clean_data("Delivery_Logistics.csv", "clean_data.csv")
\ No newline at end of file
+    clean_data("Delivery_Logistics.csv", "clean_data.parquet")
\ No newline at end of file
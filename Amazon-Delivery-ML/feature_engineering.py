@@ -1,11 +1,13 @@
-import pandas as pd
 import numpy as np
 
+from backend.app.preprocessing import FeatureEncoder
+from backend.app.table_io import read_table, write_table
 
-def feature_engineering(input_path, output_path):
+
+def feature_engineering(input_path, output_path, encoder_path="feature_encoder.json"):
 
     print("Loading cleaned dataset...")
-    df = pd.read_csv(input_path)
+    df = read_table(input_path)
 
     print("Initial Shape:", df.shape)
 
@@ -29,54 +31,18 @@ def feature_engineering(input_path, output_path):
     print(df["Delivery_Status"].value_counts())
 
     # =====================================================
-    # 2️⃣ TRAFFIC PROXY
-    # =====================================================
-
-    df["Traffic_Index"] = 0
-
-    df.loc[df["weather_condition"].isin(["stormy", "foggy", "rainy"]), "Traffic_Index"] += 2
-    df.loc[df["delivery_mode"].isin(["same day"]), "Traffic_Index"] += 2
-    df.loc[df["region"].isin(["central", "west"]), "Traffic_Index"] += 1
-
-    # =====================================================
-    # 3️⃣ OPERATIONAL COMPLEXITY
-    # =====================================================
-
-    df["Complexity_Score"] = (
-        df["distance_km"] * 0.4 +
-        df["package_weight_kg"] * 0.3 +
-        df["delivery_cost"] * 0.3
-    )
-
+    # 2️⃣ TRAFFIC PROXY, COMPLEXITY, INTERACTIONS, ENCODING
     # =====================================================
-    # 4️⃣ INTERACTION FEATURES
-    # =====================================================
-
-    df["Distance_Weight"] = df["distance_km"] * df["package_weight_kg"]
-    df["Cost_per_KM"] = df["delivery_cost"] / (df["distance_km"] + 1)
-    df["Cost_per_Weight"] = df["delivery_cost"] / (df["package_weight_kg"] + 1)
-
-    df["Log_Distance"] = np.log1p(df["distance_km"])
-    df["Log_Weight"] = np.log1p(df["package_weight_kg"])
-    df["Log_Cost"] = np.log1p(df["delivery_cost"])
-
-    # =====================================================
-    # 5️⃣ ENCODING
-    # =====================================================
-
-    categorical_cols = [
-        "delivery_partner",
-        "package_type",
-        "vehicle_type",
-        "delivery_mode",
-        "region",
-        "weather_condition"
-    ]
 
-    df = pd.get_dummies(df, columns=categorical_cols, drop_first=True)
+    # Fitted here and saved next to the model; the backend scores with the
+    # same encoder (backend/app/preprocessing.py).
+    encoder = FeatureEncoder.fit(df)
+    df = encoder.transform_frame(df).assign(Delivery_Status=df["Delivery_Status"])
+    encoder.save(encoder_path)
+    print("Feature encoder saved:", encoder_path)
 
     # =====================================================
-    # 6️⃣ CONTROLLED REAL-WORLD NOISE (10%)
+    # 3️⃣ CONTROLLED REAL-WORLD NOISE (10%)
     # =====================================================
 
     np.random.seed(42)
@@ -96,7 +62,7 @@ def feature_engineering(input_path, output_path):
         df[col] = df[col] + noise
 
     # =====================================================
-    # 7️⃣ FINAL CLEAN
+    # 4️⃣ FINAL CLEAN
     # =====================================================
 
     df.dropna(inplace=True)
@@ -104,9 +70,9 @@ def feature_engineering(input_path, output_path):
 
     print("\nFinal Shape After Feature Engineering:", df.shape)
 
-    df.to_csv(output_path, index=False)
-    print("Feature dataset saved successfully.")
+    output_path = write_table(df, output_path)
+    print("Feature dataset saved successfully:", output_path)
 
 
 if __name__ == "__main__":
-    feature_engineering("clean_data.csv", "feature_data.csv")
\ No newline at end of file
+    feature_engineering("clean_data.parquet", "feature_data.parquet", "feature_encoder.json")
\ No newline at end of file
@@ -19,6 +19,19 @@ import KpiCard from "../components/KpiCard";
 
 const COLORS = ["#22c55e", "#f59e0b", "#ef4444"];
 
+// risk_trend buckets are ISO dates ("2024-05-01") or hours ("2024-05-01T13").
+const formatTrendBucket = (bucket) => {
+  const text = String(bucket);
+  return text.includes("T")
+    ? `${text.slice(5, 10)} ${text.slice(11)}:00`
+    : text.slice(5);
+};
+
+const formatTrendLabel = (bucket, payload) => {
+  const predictions = payload?.[0]?.payload?.predictions ?? 0;
+  return `${formatTrendBucket(bucket)} · ${predictions} predictions`;
+};
+
 export default function OverviewPage() {
   const [data, setData] = useState(null);
 
@@ -91,13 +104,22 @@ export default function OverviewPage() {
 
         <div className="card-base p-5 xl:col-span-2">
           <h3 className="text-slate-900">Delivery Risk Trend</h3>
+          <p className="soft-label mt-1">
+            Share of predictions per day, from prediction history
+          </p>
           <div className="h-72">
             <ResponsiveContainer>
               <LineChart data={data.risk_trend}>
                 <CartesianGrid strokeDasharray="3 3" />
-                <XAxis dataKey="day" />
-                <YAxis />
-                <Tooltip />
+                <XAxis dataKey="day" tickFormatter={formatTrendBucket} />
+                <YAxis
+                  domain={[0, 100]}
+                  tickFormatter={(value) => `${value}%`}
+                />
+                <Tooltip
+                  labelFormatter={formatTrendLabel}
+                  formatter={(value) => `${value}%`}
+                />
                 <Legend />
                 <Line
                   type="monotone"
@@ -1,12 +1,37 @@
+import time
+import tracemalloc
+
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from imblearn.over_sampling import SMOTE
 
+from backend.app.table_io import read_table, write_table
+from oversampling import CHUNK_ROWS, K_NEIGHBORS, PARTITION_ROWS, oversample_to_table, weights_to_table
+
+
+OVERSAMPLING_METHODS = ["partitioned", "weights", "smote"]
 
-def handle_imbalance(input_path):
+
+def handle_imbalance(
+    input_path,
+    balanced_path="balanced_train.parquet",
+    test_path="test_data.parquet",
+    method="partitioned",
+    k_neighbors=K_NEIGHBORS,
+    partition_rows=PARTITION_ROWS,
+    chunk_rows=CHUNK_ROWS,
+    trace_memory=True,
+):
+    # method: "partitioned" streams SMOTE-style synthetic rows from
+    # partitioned per-class neighbour search straight into the table;
+    # "weights" writes the training rows with a class-balancing
+    # sample_weight column instead; "smote" is the in-memory imblearn path.
+    # trace_memory=False skips tracemalloc so the timing is plain wall time.
+    if method not in OVERSAMPLING_METHODS:
+        raise ValueError(f"Unknown oversampling method: {method}")
 
     print("Loading feature dataset...")
-    df = pd.read_csv(input_path)
+    df = read_table(input_path)
 
     print("Original Class Distribution:")
     print(df["Delivery_Status"].value_counts())
@@ -23,23 +48,50 @@ def handle_imbalance(input_path):
         random_state=42
     )
 
-    print("\nTraining Set Distribution (Before SMOTE):")
+    print("\nTraining Set Distribution (Before Balancing):")
     print(y_train.value_counts())
 
-    # Apply SMOTE only on training
-    smote = SMOTE(random_state=42)
-    X_train_bal, y_train_bal = smote.fit_resample(X_train, y_train)
-
-    print("\nTraining Set Distribution (After SMOTE):")
-    print(pd.Series(y_train_bal).value_counts())
-
-    # Save balanced training data
-    balanced_train = pd.concat(
-        [pd.DataFrame(X_train_bal), pd.Series(y_train_bal, name="Delivery_Status")],
-        axis=1
-    )
-
-    balanced_train.to_csv("balanced_train.csv", index=False)
+    # Under pipeline.py the stage is already traced: leave its peak alone
+    # and report how far balancing raised it.
+    owns_trace = trace_memory and not tracemalloc.is_tracing()
+    if owns_trace:
+        tracemalloc.start()
+    peak_before = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    started = time.perf_counter()
+
+    if method == "smote":
+        # Apply SMOTE only on training
+        smote = SMOTE(random_state=42, k_neighbors=k_neighbors)
+        X_train_bal, y_train_bal = smote.fit_resample(X_train, y_train)
+
+        # Save balanced training data
+        balanced_train = pd.concat(
+            [pd.DataFrame(X_train_bal), pd.Series(y_train_bal, name="Delivery_Status")],
+            axis=1
+        )
+        balanced_path = write_table(balanced_train, balanced_path)
+        summary = {"path": balanced_path, "rows": len(balanced_train)}
+    elif method == "weights":
+        summary = weights_to_table(X_train, y_train, balanced_path, chunk_rows)
+    else:
+        summary = oversample_to_table(X_train, y_train, balanced_path, k_neighbors, partition_rows, chunk_rows)
+
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+    if owns_trace:
+        tracemalloc.stop()
+    balanced_path = summary["path"]
+
+    if peak is None:
+        memory = ""
+    elif owns_trace:
+        memory = f", peak {peak / 1024 ** 2:.1f} MB"
+    else:
+        memory = f", raised the traced peak by {(peak - peak_before) / 1024 ** 2:.1f} MB"
+    print(f"\nBalancing ({method}): {summary['rows']} rows in {seconds:.2f}s{memory}")
+    if "classes" in summary:
+        label = "Class weights" if method == "weights" else "Rows per class"
+        print(f"{label}:", summary["classes"])
 
     # Save test separately
     test_data = pd.concat(
@@ -47,11 +99,11 @@ def handle_imbalance(input_path):
         axis=1
     )
 
-    test_data.to_csv("test_data.csv", index=False)
+    test_path = write_table(test_data, test_path)
 
-    print("\nBalanced training data saved.")
-    print("Test data saved.")
+    print("\nBalanced training data saved:", balanced_path)
+    print("Test data saved:", test_path)
 
 
 if __name__ == "__main__":
-    handle_imbalance("feature_data.csv")
\ No newline at end of file
+    handle_imbalance("feature_data.parquet")
\ No newline at end of file
@@ -0,0 +1,340 @@
+import argparse
+import itertools
+import json
+import math
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+
+from backend.app.artifact_cache import check_fingerprints, fingerprint
+from backend.app.config import FEATURE_DATA_PATH, TUNING_CACHE_PATH, TUNING_RESULTS_PATH
+from backend.app.table_io import read_table, resolve_table
+
+
+SEARCH_SPACE = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [4, 5, 6, 8, 12],
+    "min_samples_leaf": [5, 15, 30],
+}
+
+
+class Budget:
+    # Wall-clock and/or CPU seconds (process_time includes the forest's
+    # worker threads). Checked before each candidate is evaluated, so a run
+    # overshoots by at most one cross-validated fit.
+    def __init__(self, wall_seconds: float | None = None, cpu_seconds: float | None = None):
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.wall_started = time.perf_counter()
+        self.cpu_started = time.process_time()
+
+    def wall_used(self) -> float:
+        return time.perf_counter() - self.wall_started
+
+    def cpu_used(self) -> float:
+        return time.process_time() - self.cpu_started
+
+    def exhausted(self) -> bool:
+        if self.wall_seconds is not None and self.wall_used() >= self.wall_seconds:
+            return True
+        return self.cpu_seconds is not None and self.cpu_used() >= self.cpu_seconds
+
+
+class SplitCache:
+    # The float32 train/test matrices and every fold split, kept in one
+    # joblib file keyed by the feature table's fingerprint; a rerun loads the
+    # arrays instead of re-reading, re-encoding and re-splitting the table.
+    def __init__(self, input_path, cache_path=TUNING_CACHE_PATH):
+        self.input_path = resolve_table(input_path)
+        self.cache_path = Path(cache_path)
+        self._dirty = False
+        self.state = self._load() or self._build()
+
+    def _load(self) -> dict | None:
+        if not self.cache_path.exists():
+            return None
+        try:
+            state = joblib.load(self.cache_path)
+        except (OSError, ValueError, KeyError, EOFError):
+            return None
+        if check_fingerprints({"input": state.get("input")}, {"input": self.input_path}) is None:
+            return None
+        print("Using cached feature matrix:", self.cache_path)
+        return state
+
+    def _build(self) -> dict:
+        print("Loading feature dataset...")
+        df = read_table(self.input_path)
+        X = df.drop("Delivery_Status", axis=1).to_numpy(dtype=np.float32)
+        y = df["Delivery_Status"].to_numpy()
+        # Same holdout as advanced(), so the search never sees the test rows.
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, stratify=y, random_state=42)
+        self._dirty = True
+        return {
+            "input": fingerprint(self.input_path),
+            "X_train": np.ascontiguousarray(X_train),
+            "X_test": np.ascontiguousarray(X_test),
+            "y_train": y_train,
+            "y_test": y_test,
+            "folds": {},
+        }
+
+    def folds(self, rows: int, cv_folds: int) -> list[tuple[np.ndarray, np.ndarray]]:
+        # Folds over a stratified subsample of `rows` training rows, shared by
+        # every candidate evaluated at that rung.
+        key = f"{rows}x{cv_folds}"
+        if key not in self.state["folds"]:
+            y_train = self.state["y_train"]
+            indices = np.arange(len(y_train))
+            if rows < len(indices):
+                indices, _ = train_test_split(indices, train_size=rows, stratify=y_train, random_state=42)
+                indices = np.sort(indices)
+            splitter = StratifiedKFold(n_splits=cv_folds, shuffle=True, random_state=42)
+            self.state["folds"][key] = [
+                (indices[train], indices[val]) for train, val in splitter.split(indices, y_train[indices])
+            ]
+            self._dirty = True
+        return self.state["folds"][key]
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+        joblib.dump(self.state, tmp_path)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+
+def build_configs(search_space=SEARCH_SPACE) -> list[dict]:
+    names = list(search_space)
+    return [dict(zip(names, values)) for values in itertools.product(*(search_space[name] for name in names))]
+
+
+def build_rungs(n_configs: int, train_rows: int, eta: int, min_fraction: float) -> list[dict]:
+    # Data fraction grows by eta per rung and ends at the full training set;
+    # each rung keeps the best 1/eta of the candidates.
+    by_fraction = math.floor(math.log(1 / min_fraction, eta) + 1e-9) + 1
+    by_configs = math.ceil(math.log(max(1, n_configs), eta) - 1e-9) + 1
+    n_rungs = max(1, min(by_fraction, by_configs))
+    rungs = []
+    for index in range(n_rungs):
+        fraction = min(1.0, eta ** (index - n_rungs + 1))
+        rungs.append({"rung": index, "fraction": round(fraction, 4), "rows": max(1, int(train_rows * fraction))})
+    return rungs
+
+
+def evaluate_config(params: dict, X: np.ndarray, y: np.ndarray, folds) -> dict:
+    fit_seconds = 0.0
+    score_seconds = 0.0
+    accuracies, macro_f1s = [], []
+    for train, val in folds:
+        model = RandomForestClassifier(**params, random_state=42, n_jobs=-1)
+        started = time.perf_counter()
+        model.fit(X[train], y[train])
+        fit_seconds += time.perf_counter() - started
+
+        started = time.perf_counter()
+        predictions = model.predict(X[val])
+        score_seconds += time.perf_counter() - started
+        accuracies.append(accuracy_score(y[val], predictions))
+        macro_f1s.append(f1_score(y[val], predictions, average="macro"))
+
+    return {
+        "cv_accuracy": round(float(np.mean(accuracies)), 4),
+        "cv_accuracy_std": round(float(np.std(accuracies)), 4),
+        "cv_macro_f1": round(float(np.mean(macro_f1s)), 4),
+        "fit_seconds": round(fit_seconds, 3),
+        "score_seconds": round(score_seconds, 3),
+    }
+
+
+def successive_halving(
+    cache: SplitCache,
+    configs: list[dict],
+    budget: Budget,
+    eta: int = 3,
+    min_fraction: float = 1 / 9,
+    cv_folds: int = 5,
+) -> tuple[list[dict], list[dict], bool]:
+    X = cache.state["X_train"]
+    y = cache.state["y_train"]
+    rungs = build_rungs(len(configs), len(y), eta, min_fraction)
+    entries = [{"params": params, "rung": None, "history": []} for params in configs]
+    survivors = list(range(len(entries)))
+    stopped_early = False
+
+    for rung in rungs:
+        folds = cache.folds(rung["rows"], cv_folds)
+        print(f"\nRung {rung['rung']}: {len(survivors)} candidates on {rung['rows']} rows ({rung['fraction']:.0%})")
+        evaluated = []
+        for index in survivors:
+            if budget.exhausted():
+                stopped_early = True
+                break
+            result = evaluate_config(entries[index]["params"], X, y, folds)
+            entries[index]["rung"] = rung["rung"]
+            entries[index]["history"].append({"rung": rung["rung"], "rows": rung["rows"], **result})
+            evaluated.append(index)
+            print(f"  {entries[index]['params']} -> {result['cv_accuracy']:.4f} ({result['fit_seconds']:.2f}s fit)")
+        if stopped_early or not evaluated:
+            stopped_early = True
+            break
+
+        evaluated.sort(key=lambda index: -entries[index]["history"][-1]["cv_accuracy"])
+        survivors = evaluated[: max(1, math.ceil(len(evaluated) / eta))]
+
+    return _leaderboard(entries), rungs, stopped_early
+
+
+def _leaderboard(entries: list[dict]) -> list[dict]:
+    # Deeper rungs (more data) outrank shallower ones; then CV accuracy.
+    ranked = []
+    for entry in entries:
+        last = entry["history"][-1] if entry["history"] else None
+        ranked.append(
+            {
+                "params": entry["params"],
+                "rung": entry["rung"],
+                "cv_accuracy": last["cv_accuracy"] if last else None,
+                "fit_seconds": round(sum(step["fit_seconds"] for step in entry["history"]), 3),
+                "score_seconds": round(sum(step["score_seconds"] for step in entry["history"]), 3),
+                "history": entry["history"],
+            }
+        )
+    ranked.sort(
+        key=lambda item: (
+            -(item["rung"] if item["rung"] is not None else -1),
+            -(item["cv_accuracy"] or 0.0),
+            item["fit_seconds"],
+        )
+    )
+    for position, item in enumerate(ranked, start=1):
+        item["rank"] = position
+    return ranked
+
+
+def holdout_score(cache: SplitCache, params: dict) -> dict:
+    model = RandomForestClassifier(**params, random_state=42, n_jobs=-1)
+    started = time.perf_counter()
+    model.fit(cache.state["X_train"], cache.state["y_train"])
+    fit_seconds = time.perf_counter() - started
+    predictions = model.predict(cache.state["X_test"])
+    return {
+        "holdout_accuracy": round(float(accuracy_score(cache.state["y_test"], predictions)), 4),
+        "holdout_macro_f1": round(float(f1_score(cache.state["y_test"], predictions, average="macro")), 4),
+        "fit_seconds": round(fit_seconds, 3),
+    }
+
+
+def tune(
+    input_path=FEATURE_DATA_PATH,
+    results_path=TUNING_RESULTS_PATH,
+    cache_path=TUNING_CACHE_PATH,
+    search_space=SEARCH_SPACE,
+    budget_seconds: float | None = None,
+    cpu_budget_seconds: float | None = None,
+    eta: int = 3,
+    min_fraction: float = 1 / 9,
+    cv_folds: int = 5,
+) -> dict:
+    budget = Budget(budget_seconds, cpu_budget_seconds)
+    cache = SplitCache(input_path, cache_path)
+    configs = build_configs(search_space)
+
+    leaderboard, rungs, stopped_early = successive_halving(cache, configs, budget, eta, min_fraction, cv_folds)
+    cache.save()
+    best = leaderboard[0] if leaderboard and leaderboard[0]["rung"] is not None else None
+    # The refit on the full training set is reported, not budgeted.
+    holdout = holdout_score(cache, best["params"]) if best else None
+
+    output = {
+        "input": str(cache.input_path),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+        "budget": {"wall_seconds": budget_seconds, "cpu_seconds": cpu_budget_seconds},
+        "stopped_early": stopped_early,
+        "wall_seconds": round(budget.wall_used(), 3),
+        "cpu_seconds": round(budget.cpu_used(), 3),
+        "eta": eta,
+        "cv_folds": cv_folds,
+        "rungs": rungs,
+        "best": {"params": best["params"], "cv_accuracy": best["cv_accuracy"], **holdout} if best else None,
+        "leaderboard": leaderboard,
+    }
+
+    results_path = Path(results_path)
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_path, "w", encoding="utf-8") as f:
+        json.dump(output, f, indent=2)
+    return output
+
+
+def print_leaderboard(result: dict, limit: int = 15) -> None:
+    print("\nRank  Rung  CV acc   Fit s   n_estimators  max_depth  min_samples_leaf")
+    for item in result["leaderboard"][:limit]:
+        params = item["params"]
+        cv_accuracy = f"{item['cv_accuracy']:.4f}" if item["cv_accuracy"] is not None else "  -   "
+        rung = item["rung"] if item["rung"] is not None else "-"
+        print(
+            f"{item['rank']:>4}  {rung:>4}  {cv_accuracy}  {item['fit_seconds']:>6.2f}"
+            f"  {params['n_estimators']:>12}  {params['max_depth']:>9}  {params['min_samples_leaf']:>16}"
+        )
+
+    print(f"\nSearched for {result['wall_seconds']:.1f}s wall / {result['cpu_seconds']:.1f}s CPU"
+          + (" (budget reached)" if result["stopped_early"] else ""))
+    best = result["best"]
+    if best is None:
+        print("No candidate finished within the budget.")
+        return
+    print(f"Best: {best['params']} cv={best['cv_accuracy']:.4f} holdout={best['holdout_accuracy']:.4f}")
+    print(
+        "Apply with: python pipeline.py"
+        f" --n-estimators {best['params']['n_estimators']}"
+        f" --max-depth {best['params']['max_depth']}"
+        f" --min-samples-leaf {best['params']['min_samples_leaf']}"
+    )
+
+
+def add_tuning_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--budget-seconds", type=float, default=None, help="wall-clock budget for the search")
+    parser.add_argument("--cpu-budget-seconds", type=float, default=None, help="CPU-time budget for the search")
+    parser.add_argument("--eta", type=int, default=3, help="keep the best 1/eta candidates per rung")
+    parser.add_argument("--min-fraction", type=float, default=1 / 9, help="training fraction of the first rung")
+    parser.add_argument("--cv-folds", type=int, default=5)
+    parser.add_argument("--n-estimators", type=int, nargs="+", default=SEARCH_SPACE["n_estimators"])
+    parser.add_argument("--max-depth", type=int, nargs="+", default=SEARCH_SPACE["max_depth"])
+    parser.add_argument("--min-samples-leaf", type=int, nargs="+", default=SEARCH_SPACE["min_samples_leaf"])
+
+
+def tune_from_args(args: argparse.Namespace, input_path=FEATURE_DATA_PATH) -> dict:
+    result = tune(
+        input_path=input_path,
+        search_space={
+            "n_estimators": args.n_estimators,
+            "max_depth": args.max_depth,
+            "min_samples_leaf": args.min_samples_leaf,
+        },
+        budget_seconds=args.budget_seconds,
+        cpu_budget_seconds=args.cpu_budget_seconds,
+        eta=args.eta,
+        min_fraction=args.min_fraction,
+        cv_folds=args.cv_folds,
+    )
+    print_leaderboard(result)
+    print("\nSaved tuning results to:", TUNING_RESULTS_PATH)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Successive-halving search over RandomForest settings.")
+    parser.add_argument("--input", default=str(FEATURE_DATA_PATH))
+    add_tuning_arguments(parser)
+    args = parser.parse_args()
+    tune_from_args(args, args.input)
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+
+from backend.app.table_io import TableWriter
+
+
+K_NEIGHBORS = 5
+PARTITION_ROWS = 50_000
+CHUNK_ROWS = 50_000
+# With 45 columns sklearn's "auto" picks brute force (quadratic per class);
+# the one-hot-heavy rows have low intrinsic dimension, where a ball tree is
+# several times faster.
+NEIGHBOR_ALGORITHM = "ball_tree"
+
+
+def class_targets(y: np.ndarray) -> dict:
+    # Every class is brought up to the size of the largest one.
+    classes, counts = np.unique(y, return_counts=True)
+    target = int(counts.max())
+    return {cls: {"rows": int(count), "target": target} for cls, count in zip(classes, counts)}
+
+
+def partitioned_neighbors(X: np.ndarray, k: int, partition_rows: int, rng: np.random.Generator) -> np.ndarray:
+    # k nearest same-class neighbours per row. Classes larger than
+    # partition_rows are shuffled into partitions and searched within each
+    # one: neighbours are approximate, but cost and memory grow with the
+    # partition size instead of the class size.
+    n_rows = X.shape[0]
+    neighbors = np.empty((n_rows, k), dtype=np.int64)
+    order = rng.permutation(n_rows) if n_rows > partition_rows else np.arange(n_rows)
+    n_partitions = max(1, int(np.ceil(n_rows / partition_rows)))
+
+    for partition in np.array_split(order, n_partitions):
+        partition_k = min(k, len(partition) - 1)
+        if partition_k < 1:
+            neighbors[partition] = partition[:, np.newaxis]
+            continue
+        search = NearestNeighbors(n_neighbors=partition_k + 1, algorithm=NEIGHBOR_ALGORITHM, n_jobs=-1).fit(X[partition])
+        found = search.kneighbors(X[partition], return_distance=False)[:, 1:]
+        # Short partitions repeat their own neighbours to fill k columns.
+        neighbors[partition] = partition[found[:, np.arange(k) % partition_k]]
+    return neighbors
+
+
+def synthesize_class(
+    frame: pd.DataFrame,
+    n_new: int,
+    k: int = K_NEIGHBORS,
+    partition_rows: int = PARTITION_ROWS,
+    chunk_rows: int = CHUNK_ROWS,
+    rng: np.random.Generator | None = None,
+):
+    # SMOTE interpolation, yielded chunk_rows at a time. Float columns are
+    # interpolated between a row and one of its neighbours; bool and int
+    # columns (one-hots, Traffic_Index) are copied from whichever endpoint is
+    # nearer, so each synthetic row keeps a valid one-hot per field.
+    rng = rng or np.random.default_rng(42)
+    float_columns = [column for column in frame.columns if pd.api.types.is_float_dtype(frame[column])]
+    other_columns = [column for column in frame.columns if column not in float_columns]
+
+    neighbors = partitioned_neighbors(frame.to_numpy(dtype=np.float32), k, partition_rows, rng)
+    floats = frame[float_columns].to_numpy(dtype=np.float64)
+    others = {column: frame[column].to_numpy() for column in other_columns}
+
+    for start in range(0, n_new, chunk_rows):
+        size = min(chunk_rows, n_new - start)
+        base = rng.integers(len(frame), size=size)
+        neighbor = neighbors[base, rng.integers(k, size=size)]
+        gap = rng.random(size)
+
+        chunk = pd.DataFrame(floats[base] + gap[:, np.newaxis] * (floats[neighbor] - floats[base]), columns=float_columns)
+        source = np.where(gap < 0.5, base, neighbor)
+        for column, values in others.items():
+            chunk[column] = values[source]
+        yield chunk[list(frame.columns)]
+
+
+def oversample_to_table(
+    X: pd.DataFrame,
+    y: pd.Series,
+    output_path,
+    k: int = K_NEIGHBORS,
+    partition_rows: int = PARTITION_ROWS,
+    chunk_rows: int = CHUNK_ROWS,
+    seed: int = 42,
+) -> dict:
+    # Streams the original rows, then each class's synthetic rows, into one
+    # table; only one chunk of synthetic rows exists in memory at a time.
+    rng = np.random.default_rng(seed)
+    labels = y.to_numpy()
+    targets = class_targets(labels)
+
+    with TableWriter(output_path) as writer:
+        for start in range(0, len(X), chunk_rows):
+            chunk = X.iloc[start:start + chunk_rows].reset_index(drop=True)
+            chunk[y.name] = labels[start:start + chunk_rows]
+            writer.write(chunk)
+
+        for cls, counts in targets.items():
+            n_new = counts["target"] - counts["rows"]
+            if n_new <= 0:
+                continue
+            members = X[labels == cls]
+            for chunk in synthesize_class(members, n_new, k, partition_rows, chunk_rows, rng):
+                chunk[y.name] = np.full(len(chunk), cls, dtype=labels.dtype)
+                writer.write(chunk)
+
+    return {
+        "path": writer.path,
+        "rows": writer.rows,
+        "classes": {str(cls): counts["target"] for cls, counts in targets.items()},
+    }
+
+
+def weights_to_table(X: pd.DataFrame, y: pd.Series, output_path, chunk_rows: int = CHUNK_ROWS) -> dict:
+    # Balances by weight instead of rows: each class's weights sum to the
+    # size of the largest class, so no synthetic rows are generated.
+    labels = y.to_numpy()
+    targets = class_targets(labels)
+    class_weight = {cls: counts["target"] / counts["rows"] for cls, counts in targets.items()}
+    classes = np.array(list(class_weight))
+    weights = np.array(list(class_weight.values()), dtype=np.float64)[np.searchsorted(classes, labels)]
+
+    with TableWriter(output_path) as writer:
+        for start in range(0, len(X), chunk_rows):
+            chunk = X.iloc[start:start + chunk_rows].reset_index(drop=True)
+            chunk[y.name] = labels[start:start + chunk_rows]
+            chunk["sample_weight"] = weights[start:start + chunk_rows]
+            writer.write(chunk)
+
+    return {
+        "path": writer.path,
+        "rows": writer.rows,
+        "classes": {str(cls): round(weight, 6) for cls, weight in class_weight.items()},
+    }
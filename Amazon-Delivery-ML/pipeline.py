@@ -0,0 +1,276 @@
+import argparse
+import hashlib
+import inspect
+import json
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from advanced_models import advanced
+from backend.app.artifact_cache import check_fingerprints, fingerprint
+from backend.app.config import (
+    BALANCED_TRAIN_PATH,
+    CLEAN_DATA_PATH,
+    ENCODER_PATH,
+    FEATURE_DATA_PATH,
+    METRICS_PATH,
+    MODEL_PATH,
+    PIPELINE_STATE_PATH,
+    RAW_DATA_PATH,
+    TEST_DATA_PATH,
+)
+from backend.app.generate_metrics import generate_metrics
+from backend.app.table_io import resolve_table
+from data_cleaning import clean_data
+from feature_engineering import feature_engineering
+from imbalance_handler import OVERSAMPLING_METHODS, handle_imbalance
+
+
+PROJECT_DIR = Path(__file__).resolve().parent
+
+
+def local_modules(func) -> list[Path]:
+    # The stage function's file plus every project module reachable from it
+    # through imports (oversampling.py, model_tuning.py, table_io.py, ...),
+    # so editing a helper re-runs the stages that use it.
+    found = set()
+    pending = [sys.modules[func.__module__]]
+    while pending:
+        module = pending.pop()
+        path = getattr(module, "__file__", None)
+        if path is None:
+            continue
+        path = Path(path).resolve()
+        if path in found or PROJECT_DIR not in path.parents or "site-packages" in path.parts or not path.is_file():
+            continue
+        found.add(path)
+        for value in vars(module).values():
+            if inspect.ismodule(value):
+                pending.append(value)
+            elif inspect.isfunction(value) or inspect.isclass(value):
+                owner = sys.modules.get(value.__module__)
+                if owner is not None:
+                    pending.append(owner)
+    return sorted(found)
+
+
+class Stage:
+    def __init__(self, name, func, inputs, outputs, params=None, options=None):
+        # inputs/outputs map the stage function's path arguments to files;
+        # params are the remaining keyword arguments and are part of the
+        # stage hash, so changing one re-runs the stage and nothing upstream.
+        # options are passed too but not hashed: they change how a stage is
+        # measured, not what it produces.
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or {}
+        self.options = options or {}
+
+    def code_hash(self) -> str:
+        digest = hashlib.sha256()
+        for path in local_modules(self.func):
+            digest.update(path.relative_to(PROJECT_DIR).as_posix().encode())
+            digest.update(path.read_bytes())
+        return digest.hexdigest()
+
+    def params_hash(self) -> str:
+        return hashlib.sha256(json.dumps(self.params, sort_keys=True).encode()).hexdigest()
+
+    def input_paths(self) -> dict[str, Path]:
+        return {name: resolve_table(path) for name, path in self.inputs.items()}
+
+    def output_paths(self) -> dict[str, Path]:
+        return {name: resolve_table(path) for name, path in self.outputs.items()}
+
+    def run(self) -> None:
+        for path in self.outputs.values():
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        paths = {name: str(path) for name, path in {**self.inputs, **self.outputs}.items()}
+        self.func(**paths, **self.params, **self.options)
+
+
+def build_stages(raw_path=RAW_DATA_PATH, train_params=None, balance_params=None, trace_memory=True) -> list[Stage]:
+    clean_path = CLEAN_DATA_PATH.with_suffix(".parquet")
+    feature_path = FEATURE_DATA_PATH.with_suffix(".parquet")
+    return [
+        Stage("clean_data", clean_data, {"input_path": raw_path}, {"output_path": clean_path}),
+        Stage(
+            "feature_engineering",
+            feature_engineering,
+            {"input_path": clean_path},
+            {"output_path": feature_path, "encoder_path": ENCODER_PATH},
+        ),
+        Stage(
+            "handle_imbalance",
+            handle_imbalance,
+            {"input_path": feature_path},
+            {
+                "balanced_path": BALANCED_TRAIN_PATH.with_suffix(".parquet"),
+                "test_path": TEST_DATA_PATH.with_suffix(".parquet"),
+            },
+            balance_params,
+            {"trace_memory": trace_memory},
+        ),
+        Stage("advanced", advanced, {"input_path": feature_path}, {"model_path": MODEL_PATH}, train_params),
+        Stage("generate_metrics", generate_metrics, {"feature_path": feature_path}, {"metrics_path": METRICS_PATH}),
+    ]
+
+
+def upstream_of(stages: list[Stage]) -> dict[str, set[str]]:
+    producers = {}
+    for stage in stages:
+        for path in stage.outputs.values():
+            producers[Path(path)] = stage.name
+    return {
+        stage.name: {producers[Path(path)] for path in stage.inputs.values() if Path(path) in producers}
+        for stage in stages
+    }
+
+
+def load_state(path=PIPELINE_STATE_PATH) -> dict:
+    path = Path(path)
+    if not path.exists():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state: dict, path=PIPELINE_STATE_PATH) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+
+
+def stale_reason(stage: Stage, recorded: dict | None) -> str | None:
+    if recorded is None:
+        return "never run"
+    if recorded.get("code_sha256") != stage.code_hash():
+        return "code changed"
+    if recorded.get("params_sha256") != stage.params_hash():
+        return "params changed"
+    if check_fingerprints(recorded.get("inputs", {}), stage.input_paths()) is None:
+        return "inputs changed"
+    if check_fingerprints(recorded.get("outputs", {}), stage.output_paths()) is None:
+        return "outputs missing or modified"
+    return None
+
+
+def run_pipeline(
+    stages: list[Stage],
+    force: set[str] | None = None,
+    state_path=PIPELINE_STATE_PATH,
+    trace_memory: bool = True,
+) -> list[dict]:
+    # With trace_memory, peak_mb is tracemalloc's peak of Python allocations
+    # in this process only (not loky/process-pool workers), and seconds
+    # include tracemalloc's overhead, which is large for allocation-heavy
+    # pandas stages. Without it, seconds are plain wall time and peak_mb is
+    # None.
+    state = load_state(state_path)
+    force = set(force or ())
+    upstream = upstream_of(stages)
+    report = []
+
+    for stage in stages:
+        # A forced stage forces everything downstream of it as well.
+        if upstream[stage.name] & force:
+            force.add(stage.name)
+        reason = "forced" if stage.name in force else stale_reason(stage, state.get(stage.name))
+
+        if reason is None:
+            report.append({"stage": stage.name, "status": "skipped", "reason": "up to date", "seconds": 0.0, "peak_mb": None})
+            continue
+
+        missing = [name for name, path in stage.input_paths().items() if not path.exists()]
+        if missing:
+            raise FileNotFoundError(f"{stage.name}: missing inputs {missing}")
+
+        print(f"\n=== {stage.name} ({reason}) ===")
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            stage.run()
+            seconds = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+
+        state[stage.name] = {
+            "code_sha256": stage.code_hash(),
+            "params": stage.params,
+            "params_sha256": stage.params_hash(),
+            "inputs": {name: fingerprint(path) for name, path in stage.input_paths().items()},
+            "outputs": {name: fingerprint(path) for name, path in stage.output_paths().items()},
+            "seconds": round(seconds, 3),
+            "peak_mb": round(peak / 1024 ** 2, 1) if peak is not None else None,
+            "memory_traced": trace_memory,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
+        save_state(state, state_path)
+        report.append(
+            {
+                "stage": stage.name,
+                "status": "ran",
+                "reason": reason,
+                "seconds": state[stage.name]["seconds"],
+                "peak_mb": state[stage.name]["peak_mb"],
+            }
+        )
+
+    return report
+
+
+def print_report(report: list[dict], trace_memory: bool = True) -> None:
+    print("\nStage                 Status   Seconds   Peak MB   Reason")
+    for row in report:
+        peak = f"{row['peak_mb']:>9.1f}" if row["peak_mb"] is not None else f"{'-':>9}"
+        print(f"{row['stage']:<21} {row['status']:<8} {row['seconds']:>7.2f} {peak}   {row['reason']}")
+    if trace_memory:
+        print(
+            "Peak MB: Python allocations in this process only (tracemalloc), not pool workers;"
+            " seconds include tracing overhead (--no-trace-memory for plain wall time)."
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the offline pipeline, skipping up-to-date stages.")
+    parser.add_argument("--raw", default=str(RAW_DATA_PATH), help="raw delivery dataset (.csv/.xlsx/.parquet)")
+    parser.add_argument("--force", nargs="*", default=[], help="stages to re-run along with their downstream stages")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=5)
+    parser.add_argument("--min-samples-leaf", type=int, default=15)
+    parser.add_argument("--cv-folds", type=int, default=5)
+    parser.add_argument("--oversampling", choices=OVERSAMPLING_METHODS, default="partitioned")
+    parser.add_argument(
+        "--no-trace-memory",
+        dest="trace_memory",
+        action="store_false",
+        help="skip tracemalloc so stage seconds are plain wall time (no peak memory)",
+    )
+    args = parser.parse_args()
+
+    stages = build_stages(
+        Path(args.raw),
+        {
+            "n_estimators": args.n_estimators,
+            "max_depth": args.max_depth,
+            "min_samples_leaf": args.min_samples_leaf,
+            "cv_folds": args.cv_folds,
+        },
+        {"method": args.oversampling},
+        args.trace_memory,
+    )
+    unknown = set(args.force) - {stage.name for stage in stages}
+    if unknown:
+        parser.error(f"unknown stages: {sorted(unknown)}")
+    print_report(run_pipeline(stages, set(args.force), trace_memory=args.trace_memory), args.trace_memory)
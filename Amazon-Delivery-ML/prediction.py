@@ -1,21 +1,22 @@
-import pandas as pd
 import joblib
 
+from backend.app.table_io import read_table, write_table
+
 def predict():
 
     print("Loading trained model...")
     model = joblib.load("final_model.pkl")
 
-    df = pd.read_csv("feature_data.csv")
+    df = read_table("feature_data.parquet")
     X = df.drop("Delivery_Status", axis=1)
 
     predictions = model.predict(X)
 
     df["Predicted_Status"] = predictions
 
-    df.to_csv("final_predictions.csv", index=False)
+    output_path = write_table(df, "final_predictions.parquet")
 
-    print("Predictions saved as final_predictions.csv")
+    print("Predictions saved as", output_path)
 
 
 if __name__ == "__main__":
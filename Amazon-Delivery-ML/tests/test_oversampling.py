@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from backend.app.table_io import read_table
+from oversampling import oversample_to_table, weights_to_table
+
+
+REGIONS = ["region_central", "region_east", "region_west"]
+CLASS_SIZES = {0: 40, 1: 15, 2: 6}
+
+
+def make_frame() -> tuple[pd.DataFrame, pd.Series]:
+    # Classes live in disjoint distance ranges, so an interpolated row that
+    # strays from its own class's endpoints is easy to spot.
+    rng = np.random.default_rng(0)
+    frames = []
+    for cls, size in CLASS_SIZES.items():
+        region = rng.integers(len(REGIONS), size=size)
+        frame = pd.DataFrame(
+            {
+                "distance_km": rng.uniform(100 * cls, 100 * cls + 50, size),
+                "delivery_cost": rng.uniform(10, 500, size),
+                "Traffic_Index": rng.integers(0, 6, size),
+                **{column: region == index for index, column in enumerate(REGIONS)},
+            }
+        )
+        frame["Delivery_Status"] = cls
+        frames.append(frame)
+    df = pd.concat(frames, ignore_index=True).sample(frac=1, random_state=0).reset_index(drop=True)
+    return df.drop(columns=["Delivery_Status"]), df["Delivery_Status"]
+
+
+def test_oversample_balances_classes_with_valid_rows(tmp_path):
+    X, y = make_frame()
+    summary = oversample_to_table(X, y, tmp_path / "balanced.csv", k=3, partition_rows=10, chunk_rows=7)
+    balanced = read_table(summary["path"])
+
+    target = max(CLASS_SIZES.values())
+    assert balanced["Delivery_Status"].value_counts().to_dict() == {cls: target for cls in CLASS_SIZES}
+    assert summary["rows"] == target * len(CLASS_SIZES)
+    assert (balanced[REGIONS].astype(int).sum(axis=1) == 1).all()
+
+    for cls in CLASS_SIZES:
+        original = X[y == cls]
+        rows = balanced[balanced["Delivery_Status"] == cls]
+        for column in ["distance_km", "delivery_cost"]:
+            # Slack for the CSV round trip of the original rows themselves.
+            low, high = original[column].min(), original[column].max()
+            assert rows[column].between(low - 1e-9, high + 1e-9).all()
+        assert set(rows["Traffic_Index"]) <= set(original["Traffic_Index"])
+
+
+def test_oversample_is_deterministic(tmp_path):
+    X, y = make_frame()
+    first = oversample_to_table(X, y, tmp_path / "first.csv", k=3, partition_rows=10, chunk_rows=7)
+    second = oversample_to_table(X, y, tmp_path / "second.csv", k=3, partition_rows=10, chunk_rows=7)
+    pd.testing.assert_frame_equal(read_table(first["path"]), read_table(second["path"]))
+
+
+def test_weights_sum_to_the_largest_class(tmp_path):
+    X, y = make_frame()
+    summary = weights_to_table(X, y, tmp_path / "weighted.csv", chunk_rows=7)
+    weighted = read_table(summary["path"])
+
+    assert summary["rows"] == len(X)
+    sums = weighted.groupby("Delivery_Status")["sample_weight"].sum()
+    np.testing.assert_allclose(sums.to_numpy(), max(CLASS_SIZES.values()))